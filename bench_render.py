@@ -0,0 +1,119 @@
+"""
+Benchmark del dibujo de run_game con flotas sintéticas de N coches.
+
+Ejecuta las funciones de dibujo de client.py (draw_bridge_panel y
+draw_status_panel) con el driver de video "dummy" de SDL: no abre ventana ni
+necesita el servidor. Reporta frames por segundo y el tiempo medio de cada
+fase del frame.
+
+Por defecto solo avanza el coche que cruza, como entre dos cambios de las colas
+(queue_version estable). Con --churn las colas se vuelven a llenar en cada frame,
+como si llegara un QUEUE_STATUS por frame.
+
+Uso: python bench_render.py [n1 n2 ...] [--frames N] [--churn]
+"""
+import os
+
+# Debe definirse antes de importar client.py, que inicializa Pygame al importarse
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import sys
+import time
+
+import pygame
+
+import client
+
+DEFAULT_FLEET_SIZES = [10, 100, 1000, 10000]
+DEFAULT_FRAMES = 200
+PHASES = ["fondo", "puente", "esperando", "cruzando", "textos", "flip"]
+QUEUE_HEAD_SIZE = 200 # COLA_VISIBLE_MAXIMA de server.go: ClientIDs publicados por cola
+
+
+def make_fleet(n, seed=0):
+    """
+    Genera n coches con el mismo formato que construye network_listener: uno cruzando
+    en cars_status (clientId -> estado) y el resto repartidos entre las colas WAITING y
+    COOLDOWN de ambas direcciones, como las publica el QUEUE_STATUS del servidor
+    ((estado, dirección) -> (cabeza de la cola, total)). Retorna (cars_status, queues).
+    """
+    rng = random.Random(seed)
+    cars_status = {}
+    lanes = {}
+    for i in range(n):
+        client_id = f"Client-{i}"
+        direction = rng.choice([client.DIRECTION_EAST_WEST, client.DIRECTION_WEST_EAST])
+        if i == 0:
+            cars_status[client_id] = {
+                "clientId": client_id,
+                "position": rng.randint(0, client.LENGTH_BRIDGE),
+                "direction": direction,
+                "isCrossing": True,
+                "state": client.CAR_STATE_CROSSING
+            }
+        else:
+            state = rng.choice([client.CAR_STATE_WAITING, client.CAR_STATE_COOLDOWN])
+            lanes.setdefault((state, direction), []).append(client_id)
+    queues = {lane_key: (car_ids[:QUEUE_HEAD_SIZE], len(car_ids)) for lane_key, car_ids in lanes.items()}
+    return cars_status, queues
+
+
+def render_frames(fleet, frames, churn=False):
+    """Dibuja 'frames' frames de la flota y retorna (segundos totales, tiempos por fase)."""
+    screen = pygame.display.get_surface()
+    phase_times = {}
+    cars_status, queues = fleet
+    crossing_car = next(iter(cars_status.values()), None)
+    client.queue_lanes_version = None # La primera vuelta siempre llena las colas
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        # El coche que cruza avanza como lo haría con los CAR_STATUS del servidor
+        if crossing_car:
+            crossing_car["position"] = frame % (client.LENGTH_BRIDGE + 1)
+
+        phase_start = time.perf_counter()
+        screen.fill(client.LIGHT_GRAY)
+        client._mark_phase(phase_times, "fondo", phase_start)
+
+        active_crossing_car = client.draw_bridge_panel(screen, cars_status, queues, phase_times, cars_version=frame if churn else 0)
+        client.draw_status_panel(screen, active_crossing_car, "Benchmark", phase_times)
+
+        phase_start = time.perf_counter()
+        pygame.display.flip()
+        client._mark_phase(phase_times, "flip", phase_start)
+    return time.perf_counter() - start, phase_times
+
+
+def main():
+    args = sys.argv[1:]
+    frames = DEFAULT_FRAMES
+    if "--frames" in args:
+        index = args.index("--frames")
+        frames = int(args[index + 1])
+        del args[index:index + 2]
+    churn = "--churn" in args
+    if churn:
+        args.remove("--churn")
+    fleet_sizes = [int(arg) for arg in args] or DEFAULT_FLEET_SIZES
+
+    print(f"Driver de video: {pygame.display.get_driver()} | {frames} frames por flota{' | colas nuevas en cada frame' if churn else ''}\n")
+    header = f"{'coches':>8} | {'FPS':>9} | {'ms/frame':>9} | " + " | ".join(f"{phase:>9}" for phase in PHASES)
+    print(header)
+    print("-" * len(header))
+
+    for n in fleet_sizes:
+        fleet = make_fleet(n)
+        render_frames(fleet, min(10, frames), churn) # Calentamiento: colores y fuentes ya cacheados
+        elapsed, phase_times = render_frames(fleet, frames, churn)
+        per_phase = " | ".join(f"{phase_times.get(phase, 0.0) / frames * 1000:>9.3f}" for phase in PHASES)
+        print(f"{n:>8} | {frames / elapsed:>9.1f} | {elapsed / frames * 1000:>9.3f} | {per_phase}")
+
+    print("\n(columnas de fase en ms por frame)")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
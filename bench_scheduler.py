@@ -0,0 +1,121 @@
+"""
+Benchmark del planificador del puente: decisiones/segundo vs. largo de la cola.
+
+Compara el bucle original de manejoDelPuente (desencolar/re-encolar los coches
+en COOLDOWN) con BridgeScheduler (scheduler.py).
+
+Escenarios:
+- decisiones: N coches en una dirección, N-1 en cooldown y 1 listo. Cada
+  decisión elige el coche listo y lo vuelve a dejar elegible.
+- espera: todos los coches en cooldown; se mide el CPU consumido mientras se
+  espera a que venza el primero (el bucle original gira, el planificador duerme).
+
+Uso: python bench_scheduler.py [largo1 largo2 ...]
+
+El Planificador de server.go (el que usa el servidor) tiene su propio benchmark
+con el mismo escenario de decisiones:
+    go test -run '^$' -bench Planificador server.go planificador_bench_test.go
+"""
+import sys
+import threading
+import time
+
+from scheduler import BridgeScheduler, CAR_STATE_COOLDOWN, CAR_STATE_WAITING, DIRECTION_EAST_WEST, DIRECTION_WEST_EAST
+
+DEFAULT_QUEUE_LENGTHS = [10, 100, 1000, 10000]
+MIN_BENCH_SECONDS = 0.5
+WAIT_SECONDS = 0.2
+
+
+class LegacyCar:
+    __slots__ = ("client_id", "state")
+
+    def __init__(self, client_id, state):
+        self.client_id = client_id
+        self.state = state
+
+
+def legacy_next_car(queue):
+    """Misma lógica que el bucle original de server.go (Dequeue + Enqueue)."""
+    while len(queue) > 0:
+        car = queue.pop(0)
+        if car.state == CAR_STATE_COOLDOWN:
+            queue.append(car)
+        else:
+            return car
+    return None
+
+
+def bench_legacy_decisions(n):
+    queue = [LegacyCar(f"Client-{i}", CAR_STATE_COOLDOWN) for i in range(n - 1)]
+    queue.append(LegacyCar("ready", CAR_STATE_WAITING))
+
+    decisions = 0
+    start = time.perf_counter()
+    while True:
+        car = legacy_next_car(queue)
+        queue.append(car)
+        decisions += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_BENCH_SECONDS:
+            return decisions / elapsed
+
+
+def bench_scheduler_decisions(n):
+    scheduler = BridgeScheduler()
+    for i in range(n - 1):
+        scheduler.cooldown(f"Client-{i}", DIRECTION_EAST_WEST, 3600)
+    scheduler.add("ready", DIRECTION_EAST_WEST)
+
+    decisions = 0
+    start = time.perf_counter()
+    while True:
+        client_id, direction = scheduler.next_car(DIRECTION_EAST_WEST)
+        scheduler.cooldown(client_id, direction, 0)
+        decisions += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_BENCH_SECONDS:
+            return decisions / elapsed
+
+
+def bench_legacy_wait(n):
+    queue = [LegacyCar(f"Client-{i}", CAR_STATE_COOLDOWN) for i in range(n)]
+
+    def end_cooldown():
+        queue[0].state = CAR_STATE_WAITING
+
+    timer = threading.Timer(WAIT_SECONDS, end_cooldown)
+    cpu_start = time.process_time()
+    timer.start()
+    legacy_next_car(queue)
+    return time.process_time() - cpu_start
+
+
+def bench_scheduler_wait(n):
+    scheduler = BridgeScheduler()
+    scheduler.cooldown("Client-0", DIRECTION_WEST_EAST, WAIT_SECONDS)
+    for i in range(1, n):
+        scheduler.cooldown(f"Client-{i}", DIRECTION_WEST_EAST, 3600)
+
+    cpu_start = time.process_time()
+    scheduler.next_car(DIRECTION_WEST_EAST)
+    return time.process_time() - cpu_start
+
+
+def main():
+    queue_lengths = [int(arg) for arg in sys.argv[1:]] or DEFAULT_QUEUE_LENGTHS
+
+    print(f"{'cola':>8} | {'original dec/s':>15} | {'planificador dec/s':>18} | {'CPU espera orig.':>16} | {'CPU espera plan.':>16}")
+    print("-" * 86)
+    for n in queue_lengths:
+        legacy_rate = bench_legacy_decisions(n)
+        scheduler_rate = bench_scheduler_decisions(n)
+        legacy_cpu = bench_legacy_wait(n)
+        scheduler_cpu = bench_scheduler_wait(n)
+        print(f"{n:>8} | {legacy_rate:>15.0f} | {scheduler_rate:>18.0f} | {legacy_cpu:>15.3f}s | {scheduler_cpu:>15.3f}s")
+
+    print(f"\n(espera: {WAIT_SECONDS}s hasta que vence el primer cooldown)")
+
+
+if __name__ == "__main__":
+    main()
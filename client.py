@@ -5,6 +5,12 @@ import threading
 import sys
 import time
 import random
+import argparse
+import uuid
+import zlib
+
+from tracing import LatencyTracer
+from sharding import HashRing, LoadMonitor, ShardObserver, format_endpoint, parse_endpoints
 
 # --- Configuración de Pygame ---
 pygame.init()
@@ -31,6 +37,7 @@ SELECTED_DIRECTION_COLOR = (0, 200, 0) # Verde para la dirección seleccionada
 FONT = pygame.font.Font(None, 28)
 TITLE_FONT = pygame.font.Font(None, 40)
 HIGHLIGHT_FONT = pygame.font.Font(None, 32) # Para el auto cruzando
+QUEUE_FONT = pygame.font.Font(None, 20) # Títulos de las colas
 
 # --- Configuración de la Comunicación (Debe coincidir con el Backend Go) ---
 HOST = 'localhost'
@@ -46,7 +53,13 @@ MSG_CHANGE_CAR_PROPERTIES = "CHANGE_CAR_PROPERTIES"
 MSG_CHANGE_CAR_PROPERTIES_ACK = "CHANGE_CHANGE_CAR_PROPERTIES_ACK" # Asegúrate que esto coincida con tu backend Go
 
 MSG_END_CONNECTION = "END_CONNECTION"
+MSG_PING = "PING"
+MSG_PONG = "PONG"
+MSG_UPDATE_RATE = "UPDATE_RATE"
 MSG_RECONNECT = "RECONNECT" # No usado directamente en el cliente actual, es más bien un estado interno
+MSG_QUEUE_STATUS = "QUEUE_STATUS"
+MSG_ERROR = "ERROR"
+ERROR_UNKNOWN_CLIENT = "UNKNOWN_CLIENT" # El servidor ya no tiene el ClientID con el que intentamos reconectar
 
 DIRECTION_NONE = "NONE"
 DIRECTION_EAST_WEST = "EAST_TO_WEST"
@@ -62,8 +75,10 @@ client_socket = None
 network_thread = None
 is_connected = False
 assigned_client_id = "" # Ahora se inicializa vacío, se asignará al conectar/reconectar
-all_cars_status = {} # Diccionario para almacenar el estado de TODOS los coches
-car_status_lock = threading.Lock() # Para proteger all_cars_status de accesos concurrentes
+all_cars_status = {} # Diccionario para almacenar el estado de los coches en el puente (los de las colas van en queue_snapshot)
+car_status_lock = threading.Lock() # Para proteger all_cars_status y queue_snapshot de accesos concurrentes
+queue_snapshot = {} # (estado, dirección) -> (ClientIDs de la cabeza de la cola, total), según el último QUEUE_STATUS
+queue_version = 0 # Cambia cuando cambian las colas o el estado de un coche (no con la posición del que cruza)
 
 client_colors = {}
 # Lista de 15 colores predefinidos para los coches
@@ -91,6 +106,46 @@ reconnect_attempts = 0
 MAX_RECONNECT_ATTEMPTS = 5 # Cuántos reintentos automáticos
 RECONNECT_DELAY = 2 # Segundos entre reintentos
 reconnect_timer = 0 # Para controlar el tiempo entre reintentos
+FIRST_RECONNECT_DELAY = 0.1 # Segundos antes del primer reintento (la caída ya fue detectada por el latido)
+client_id_rejected = False # El servidor respondió UNKNOWN_CLIENT: reintentar con ese ID no sirve
+
+# Latido (PING/PONG) para detectar caídas sin depender de errores de TCP
+HEARTBEAT_INTERVAL = 0.25 # Segundos entre PINGs
+HEARTBEAT_MAX_MISSES = 3 # PONGs sin respuesta antes de dar la conexión por perdida
+CONNECT_CONFIRM_TIMEOUT = 2.0 # Segundos para recibir CONNECTED tras abrir el socket
+heartbeat_thread = None
+heartbeat_lock = threading.Lock() # Protege heartbeat_stats
+heartbeat_stats = {} # RTT, jitter y latidos perdidos de la conexión actual
+send_lock = threading.Lock() # El hilo de latidos y la UI escriben en el mismo socket
+
+# Frecuencia de CAR_STATUS y contrapresión. El servidor fusiona las actualizaciones
+# de un mismo coche y solo envía la última: preferimos datos recientes a verlos todos.
+MAX_UPDATE_RATE = 30 # CAR_STATUS por segundo que pedimos al servidor (0 = sin límite)
+BACKPRESSURE_MIN_FPS = 20 # Por debajo de estos FPS pedimos al servidor que retenga actualizaciones
+BACKPRESSURE_RELEASE_FPS = 40 # FPS a partir de los cuales se libera la contrapresión
+RECV_BUFFER_SIZE = 4096 # Un recv que llena el buffer indica que hay más datos esperando en el socket
+BACKPRESSURE_FULL_READS = 3 # recv seguidos que llenan el buffer para activar la contrapresión de red
+BACKPRESSURE_RELEASE_READS = 10 # recv seguidos que no lo llenan para liberarla
+requested_update_rate = MAX_UPDATE_RATE
+backpressure_sources = {"render": False, "network": False} # Motivos activos de contrapresión
+update_rate_lock = threading.RLock() # El hilo de red y el bucle principal cambian la frecuencia y la contrapresión
+update_stats = {"received": 0, "conflated": 0} # CAR_STATUS recibidos y actualizaciones fusionadas por el servidor
+
+# Trazas de latencia "tick del servidor -> pixel" (ver tracing.py). Se activan con --trace
+latency_tracer = LatencyTracer()
+trace_output_path = None # Archivo donde exportar las trazas en formato Chrome al salir
+
+# Varios puentes (ver sharding.py). Con un solo puente se usan HOST y PORT como siempre.
+PLACEMENT_HASH = "hash" # Hashing consistente de client_key sobre los puentes
+PLACEMENT_LEAST_LOADED = "least-loaded" # El puente con menos coches registrados
+SHARD_FAILOVER_ATTEMPTS = 2 # Reconexiones fallidas al mismo puente antes de pasar a otro
+bridge_endpoints = [(HOST, PORT)]
+bridge_ring = HashRing(bridge_endpoints)
+placement_strategy = PLACEMENT_HASH
+client_key = uuid.uuid4().hex # Identidad estable del cliente para el anillo (el ClientID lo asigna cada puente)
+combined_view = False # Dibujar todos los puentes lado a lado en lugar del puente propio
+shard_observers = [] # Un ShardObserver por puente mientras la vista combinada está activa
+load_monitor = None # LoadMonitor de los puentes con la estrategia least-loaded
 
 # Mapeo de direcciones para la UI
 DIRECTION_LABELS = {
@@ -233,35 +288,169 @@ def send_message(sock, message_type, data=None):
         }
     elif message_type == MSG_END_CONNECTION:
         message_to_send = {"type": MSG_END_CONNECTION}
+    elif message_type == MSG_UPDATE_RATE:
+        message_to_send = {
+            "type": MSG_UPDATE_RATE,
+            "maxUpdateRate": data.get("maxUpdateRate"),
+            "backpressure": data.get("backpressure")
+        }
+    elif message_type == MSG_PING:
+        message_to_send = {
+            "type": MSG_PING,
+            "seq": data.get("seq"),
+            "timestamp": data.get("timestamp")
+        }
     
     json_data = json.dumps(message_to_send)
     try:
-        sock.sendall(json_data.encode('utf-8') + b'\n')
+        with send_lock:
+            sock.sendall(json_data.encode('utf-8') + b'\n')
         return True
     except Exception as e:
         print(f"[!] Error enviando mensaje '{message_type}': {e}")
         return False
 
+def reset_heartbeat_stats():
+    with heartbeat_lock:
+        heartbeat_stats.clear()
+        heartbeat_stats.update({
+            "rtt_ms": None, # Último RTT medido
+            "avg_rtt_ms": None, # Media móvil del RTT
+            "jitter_ms": 0.0, # Variación del RTT (estimador de RFC 3550)
+            "missed": 0, # PONGs pendientes consecutivos
+            "sent": 0,
+            "received": 0,
+            "confirmed": False, # Llegó el CONNECTED de esta conexión
+            "last_pong": time.monotonic()
+        })
+
+def get_heartbeat_metrics():
+    """Copia de las métricas del latido para la UI o para registrarlas."""
+    with heartbeat_lock:
+        return dict(heartbeat_stats)
+
+def record_pong(message):
+    """Actualiza RTT y jitter con un PONG (el servidor devuelve nuestro timestamp)."""
+    timestamp = message.get("timestamp")
+    if not isinstance(timestamp, int):
+        return
+    rtt_ms = (time.perf_counter_ns() - timestamp) / 1_000_000
+
+    # Desfase entre el reloj del servidor y el nuestro, suponiendo un camino simétrico
+    server_time = message.get("serverTime")
+    if isinstance(server_time, int):
+        offset_ns = server_time - (time.time_ns() - int(rtt_ms * 1_000_000) // 2)
+        if heartbeat_stats.get("received"):
+            offset_ns = latency_tracer.clock_offset_ns + (offset_ns - latency_tracer.clock_offset_ns) // 8
+        latency_tracer.clock_offset_ns = offset_ns
+
+    with heartbeat_lock:
+        previous_rtt = heartbeat_stats.get("rtt_ms")
+        if previous_rtt is not None:
+            heartbeat_stats["jitter_ms"] += (abs(rtt_ms - previous_rtt) - heartbeat_stats["jitter_ms"]) / 16
+        avg_rtt = heartbeat_stats.get("avg_rtt_ms")
+        heartbeat_stats["avg_rtt_ms"] = rtt_ms if avg_rtt is None else avg_rtt + (rtt_ms - avg_rtt) / 8
+        heartbeat_stats["rtt_ms"] = rtt_ms
+        heartbeat_stats["received"] += 1
+        heartbeat_stats["missed"] = 0
+        heartbeat_stats["last_pong"] = time.monotonic()
+
+def heartbeat_sender(sock):
+    """
+    Envía PINGs periódicos y cierra la conexión si faltan HEARTBEAT_MAX_MISSES PONGs
+    seguidos. Los latidos perdidos solo cuentan después del primer PONG: un servidor
+    sin latido (como server.exe) nunca responde y la conexión sigue siendo válida.
+    Mientras tanto, la conexión se da por perdida si no llega el CONNECTED a tiempo.
+    """
+    global is_connected
+    seq = 0
+
+    while is_connected and client_socket is sock:
+        seq += 1
+        if send_message(sock, MSG_PING, {"seq": seq, "timestamp": time.perf_counter_ns()}):
+            with heartbeat_lock:
+                heartbeat_stats["sent"] += 1
+
+        time.sleep(HEARTBEAT_INTERVAL)
+
+        with heartbeat_lock:
+            silence = time.monotonic() - heartbeat_stats["last_pong"]
+            missed = int(silence / HEARTBEAT_INTERVAL) if heartbeat_stats["received"] else 0
+            heartbeat_stats["missed"] = missed
+            unconfirmed = not heartbeat_stats["confirmed"] and silence >= CONNECT_CONFIRM_TIMEOUT
+
+        if (missed >= HEARTBEAT_MAX_MISSES or unconfirmed) and is_connected and client_socket is sock:
+            if unconfirmed:
+                print(f"[!] El servidor no confirmó la conexión en {CONNECT_CONFIRM_TIMEOUT} s. Iniciando proceso de reconexión.")
+            else:
+                print(f"[!] {missed} latidos sin respuesta del servidor. Iniciando proceso de reconexión.")
+            is_connected = False
+            try:
+                sock.close() # Desbloquea el recv del hilo de red
+            except OSError:
+                pass
+            break
+
+def is_backpressure_active():
+    with update_rate_lock:
+        return any(backpressure_sources.values())
+
+def set_update_rate(max_update_rate=None, backpressure_source=None, active=False):
+    """
+    Cambia en tiempo de ejecución la frecuencia de CAR_STATUS pedida y/o activa o
+    libera un motivo de contrapresión. Solo avisa al servidor si algo cambió.
+    """
+    global requested_update_rate
+    with update_rate_lock: # También serializa los UPDATE_RATE, para que el último enviado sea el estado actual
+        was_active = is_backpressure_active()
+        previous_rate = requested_update_rate
+
+        if max_update_rate is not None:
+            requested_update_rate = max_update_rate
+        if backpressure_source is not None:
+            backpressure_sources[backpressure_source] = active
+
+        if requested_update_rate == previous_rate and is_backpressure_active() == was_active:
+            return
+        if is_backpressure_active() != was_active:
+            print(f"[*] Contrapresión {'activada' if is_backpressure_active() else 'liberada'} ({', '.join(k for k, v in backpressure_sources.items() if v) or 'sin motivos'}).")
+        if is_connected and client_socket:
+            send_message(client_socket, MSG_UPDATE_RATE, {
+                "maxUpdateRate": requested_update_rate,
+                "backpressure": is_backpressure_active()
+            })
+
 def network_listener(sock):
-    global is_connected, assigned_client_id, all_cars_status, reconnect_attempts, reconnect_timer
+    global is_connected, assigned_client_id, all_cars_status, reconnect_attempts, reconnect_timer, queue_version, client_id_rejected
     buffer = ""
+    full_reads = partial_reads = 0 # recv seguidos que llenaron / no llenaron el buffer
     print("[*] Hilo de red iniciado, escuchando mensajes...")
     
-    while is_connected:
+    while is_connected and client_socket is sock: # Si hubo reconexión, este hilo pertenece a un socket viejo
         try:
             sock.settimeout(1.0) # Pequeño timeout para no bloquear indefinidamente
-            data = sock.recv(4096).decode('utf-8')
+            raw_data = sock.recv(RECV_BUFFER_SIZE)
+            recv_ns = time.time_ns()
+            data = raw_data.decode('utf-8')
             
             if not data:
                 print("[*] Servidor desconectado o envió datos vacíos. Iniciando proceso de reconexión.")
-                is_connected = False # Marcar como desconectado
+                if client_socket is sock:
+                    is_connected = False # Marcar como desconectado
                 break # Salir del bucle del hilo, el bucle principal de Pygame manejará la reconexión
             
-            # Resetear intentos de reconexión y timer si recibimos datos
-            reconnect_attempts = 0
-            reconnect_timer = 0
-            
             buffer += data
+
+            # Si el recv llena el buffer hay datos acumulados: el hilo de red va atrasado.
+            # Con histéresis, igual que la fuente de FPS, para no alternar en cada recv
+            if len(raw_data) >= RECV_BUFFER_SIZE:
+                full_reads, partial_reads = full_reads + 1, 0
+                if full_reads >= BACKPRESSURE_FULL_READS:
+                    set_update_rate(backpressure_source="network", active=True)
+            else:
+                full_reads, partial_reads = 0, partial_reads + 1
+                if partial_reads >= BACKPRESSURE_RELEASE_READS:
+                    set_update_rate(backpressure_source="network", active=False)
             
             while '\n' in buffer:
                 line, buffer = buffer.split('\n', 1)
@@ -270,13 +459,25 @@ def network_listener(sock):
 
                 try:
                     message = json.loads(line)
+                    decode_ns = time.time_ns()
                     msg_type = message.get("tipo") # 'tipo' para mensajes del servidor al cliente
 
+                    if msg_type == MSG_PONG:
+                        record_pong(message)
+                        continue
+
                     with car_status_lock:
+                        lock_ns = time.time_ns()
                         if msg_type == MSG_CAR_STATUS:
                             car_id = message.get("clientId")
+                            update_stats["received"] += 1
+                            update_stats["conflated"] += message.get("conflated", 0)
+                            previous_status = all_cars_status.get(car_id)
                             if car_id:
                                 # Si el coche no existe o ya existe, actualizar/crear
+                                if (previous_status is None or previous_status["state"] != message.get("state", "NONE")
+                                        or previous_status["direction"] != message.get("direction", "NONE")):
+                                    queue_version += 1
                                 all_cars_status[car_id] = {
                                     "clientId": car_id,
                                     "position": message.get("position", 0),
@@ -285,43 +486,42 @@ def network_listener(sock):
                                     "state": message.get("state", "NONE")
                                 }
                                 get_unique_color(car_id) # Asegurar que tenga un color asignado
+                                latency_tracer.record_update(car_id, message.get("trace"), recv_ns, decode_ns, lock_ns, time.time_ns())
+
+                        elif msg_type == MSG_QUEUE_STATUS:
+                            # Cabeza y total de cada cola; el servidor la envía cuando cambian las colas
+                            queue_snapshot.clear()
+                            for queue in message.get("queues") or []:
+                                queue_snapshot[(queue.get("state"), queue.get("direction"))] = (queue.get("ids") or [], queue.get("total", 0))
+                            queue_version += 1
 
                         elif msg_type == MSG_CONNECTED:
                             assigned_client_id = message.get("clientId", "") # Capturar clientId del mensaje CONNECTED
                             print(f"[NET] Mensaje del Servidor: {msg_type} - Conexión establecida. ClientID: {assigned_client_id}")
+                            # Solo la confirmación del servidor cuenta como reconexión exitosa
+                            reconnect_attempts = 0
+                            reconnect_timer = 0
+                            with heartbeat_lock:
+                                heartbeat_stats["confirmed"] = True
+
+                        elif msg_type == MSG_ERROR:
+                            print(f"[NET] Mensaje del Servidor: {msg_type} - {message.get('code')} (ClientID: {message.get('clientId')})")
+                            if message.get("code") == ERROR_UNKNOWN_CLIENT:
+                                client_id_rejected = True
+                                reconnect_timer = RECONNECT_DELAY # Sin esperar: update_reconnection decide en el próximo frame
                             
                         elif msg_type == MSG_CAR_START:
                             started_client_id = message.get("clientId")
                             print(f"[NET] Mensaje del Servidor: {msg_type} - Coche comenzando a cruzar el puente. ClientID: {started_client_id}")
-                            
-                            # --- Lógica de limpieza: eliminar coches que NO son el nuestro ---
-                            # Esto asegura que la vista siempre esté limpia para el coche activo.
-                            # Si tu backend envía un MSG_CAR_START por cada coche que inicia,
-                            # esto limpiará los coches que no sean el 'assigned_client_id'.
-                            cars_to_keep = {}
-                            colors_to_keep = {}
-                            
-                            if assigned_client_id in all_cars_status:
-                                cars_to_keep[assigned_client_id] = all_cars_status[assigned_client_id]
-                                colors_to_keep[assigned_client_id] = client_colors.get(assigned_client_id)
-
-                            all_cars_status.clear()
-                            client_colors.clear()
-                            global color_index
-                            color_index = 0 # Resetear índice de colores para nuevos coches
-
-                            all_cars_status.update(cars_to_keep)
-                            client_colors.update(colors_to_keep)
-                            if assigned_client_id in all_cars_status:
-                                get_unique_color(assigned_client_id) # Reasignar color a nuestro propio coche si se mantuvo
-                            
-                            # El coche que acaba de empezar a cruzar se añadirá/actualizará con su próximo CAR_STATUS
+                            # El coche sale de su cola con el próximo QUEUE_STATUS; hasta entonces draw_bridge_panel
+                            # no lo dibuja en la cola porque ya está cruzando
 
                         elif msg_type == MSG_CAR_END:
                             client_id_ended = message.get("clientId")
                             print(f"[NET] Mensaje del Servidor: {msg_type} - Coche {client_id_ended} terminó de cruzar el puente.")
                             if client_id_ended in all_cars_status:
                                 del all_cars_status[client_id_ended] # ¡Importante! Eliminar el coche del estado
+                                queue_version += 1
                             if client_id_ended in client_colors:
                                 del client_colors[client_id_ended] # Eliminar su color asignado
 
@@ -339,11 +539,14 @@ def network_listener(sock):
 
         except ConnectionResetError:
             print("[*] Conexión reiniciada por el servidor (hilo de red). Iniciando proceso de reconexión.")
-            is_connected = False
+            if client_socket is sock:
+                is_connected = False
             break
         except socket.timeout:
             pass # Se espera si no hay datos del socket
         except Exception as e:
+            if client_socket is not sock:
+                break # El socket fue cerrado por el latido o por una reconexión
             print(f"[!] Error general de red: {e}. Iniciando proceso de reconexión.")
             is_connected = False
             break
@@ -356,7 +559,7 @@ def attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_se
     Intenta conectar o reconectar al servidor.
     is_reconnecting indica si es un intento de reconexión automática.
     """
-    global client_socket, network_thread, is_connected, assigned_client_id, all_cars_status, reconnect_attempts, reconnect_timer
+    global client_socket, network_thread, heartbeat_thread, is_connected, assigned_client_id, all_cars_status, client_id_rejected
 
     if is_connected:
         print("Ya conectado.")
@@ -377,6 +580,8 @@ def attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_se
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         client_socket.connect((HOST, PORT))
         print(f"[*] Conectado al servidor Go en {HOST}:{PORT}")
+        client_id_rejected = False
+        reset_heartbeat_stats() # Antes de iniciar el hilo de red, que marca la llegada del CONNECTED
         is_connected = True
         
         # Enviar datos iniciales (o de reconexión si assigned_client_id ya existe)
@@ -384,7 +589,12 @@ def attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_se
             "direction": direction_selected,
             "velocity": velocity,
             "tiempoDeEspera": tiempo_espera,
-            "clientId": assigned_client_id # Enviar el ID existente para reconectar
+            "clientId": assigned_client_id, # Enviar el ID existente para reconectar
+            "heartbeatIntervalMs": int(HEARTBEAT_INTERVAL * 1000),
+            "heartbeatMaxMisses": HEARTBEAT_MAX_MISSES,
+            "maxUpdateRate": requested_update_rate,
+            "backpressure": is_backpressure_active(),
+            "trace": latency_tracer.enabled
         }
         if not send_message(client_socket, "INITIAL_CLIENT_DATA", initial_data):
             is_connected = False
@@ -409,8 +619,11 @@ def attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_se
         network_thread.daemon = True # Esto permite que el programa principal se cierre incluso si el hilo está corriendo
         network_thread.start()
 
-        reconnect_attempts = 0 # Reiniciar intentos de reconexión al conectar exitosamente
-        reconnect_timer = 0
+        heartbeat_thread = threading.Thread(target=heartbeat_sender, args=(client_socket,))
+        heartbeat_thread.daemon = True
+        heartbeat_thread.start()
+
+        # Los intentos de reconexión se reinician al recibir CONNECTED, no al abrir el socket
         return True
         
     except ValueError:
@@ -429,16 +642,81 @@ def attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_se
         is_connected = False
         return False
 
+def configure_bridges(endpoints, strategy=PLACEMENT_HASH, key=None):
+    """Define los puentes disponibles y cómo se elige entre ellos."""
+    global bridge_endpoints, bridge_ring, placement_strategy, client_key, HOST, PORT, load_monitor
+    bridge_endpoints = list(endpoints)
+    bridge_ring = HashRing(bridge_endpoints)
+    placement_strategy = strategy
+    if key:
+        client_key = key
+    HOST, PORT = bridge_ring.lookup(client_key)
+
+    if load_monitor:
+        load_monitor.stop()
+        load_monitor = None
+    if placement_strategy == PLACEMENT_LEAST_LOADED and len(bridge_endpoints) > 1:
+        # Las cargas se sondean en segundo plano; solo el primer sondeo se espera, antes de abrir la ventana
+        load_monitor = LoadMonitor(bridge_endpoints).start()
+        load_monitor.wait_first_probe()
+
+def bridge_candidates(exclude=()):
+    """Puentes a probar en orden: el asignado por la estrategia primero y luego sus alternativas."""
+    if len(bridge_endpoints) <= 1:
+        return [(HOST, PORT)]
+    candidates = [endpoint for endpoint in bridge_ring.successors(client_key) if endpoint not in exclude]
+    if placement_strategy == PLACEMENT_LEAST_LOADED and load_monitor:
+        candidates = load_monitor.order(candidates) # Última carga conocida: no bloquea el bucle de Pygame
+    return candidates
+
+def connect_to_bridge(velocity_input_box, tiempo_espera_input_box, direction_selected, exclude=(), is_reconnecting=False):
+    """Conecta como coche nuevo al primer puente candidato que acepte la conexión."""
+    global HOST, PORT
+    for endpoint in bridge_candidates(exclude):
+        HOST, PORT = endpoint
+        if attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_selected, is_reconnecting):
+            return True
+    return False
+
+def failover_to_other_bridge(velocity_input_box, tiempo_espera_input_box, direction_selected):
+    """
+    El puente actual no acepta reconexiones: registra el coche como nuevo en otro puente.
+    Retorna True si alguno lo aceptó. Si no, se conserva el ClientID del puente original
+    para que update_reconnection siga reintentando con él.
+    """
+    global HOST, PORT, assigned_client_id, color_index, queue_version
+    failed_bridge = (HOST, PORT)
+    previous_client_id = assigned_client_id
+    print(f"[*] El puente {format_endpoint(failed_bridge)} no acepta la reconexión. Buscando otro puente...")
+
+    assigned_client_id = "" # El ClientID solo es válido en el puente que lo asignó
+    with car_status_lock: # La vista del puente caído ya no sirve
+        all_cars_status.clear()
+        queue_snapshot.clear()
+        client_colors.clear()
+        color_index = 0
+        queue_version += 1
+
+    if connect_to_bridge(velocity_input_box, tiempo_espera_input_box, direction_selected, exclude=[failed_bridge], is_reconnecting=True):
+        print(f"[*] Coche trasladado al puente {format_endpoint((HOST, PORT))}.")
+        return True
+
+    HOST, PORT = failed_bridge
+    assigned_client_id = previous_client_id
+    return False
+
 def connect_to_server_action(velocity_input_box, tiempo_espera_input_box, direction):
     """Acción manual de conexión."""
     global assigned_client_id
     assigned_client_id = "" # Asegurarse de que sea un nuevo cliente al conectar manualmente
     with car_status_lock: # Limpiar coches existentes al conectar como nuevo cliente
         all_cars_status.clear()
+        queue_snapshot.clear()
         client_colors.clear()
-        global color_index
+        global color_index, queue_version
         color_index = 0
-    attempt_connection(velocity_input_box, tiempo_espera_input_box, direction, is_reconnecting=False)
+        queue_version += 1
+    connect_to_bridge(velocity_input_box, tiempo_espera_input_box, direction)
 
 def change_properties_action(velocity_input_box, tiempo_espera_input_box):
     if not is_connected:
@@ -481,9 +759,11 @@ def end_connection_action():
     assigned_client_id = "" # Resetear el ID del cliente al terminar conexión
     with car_status_lock: # Limpiar todos los coches al terminar conexión
         all_cars_status.clear()
+        queue_snapshot.clear()
         client_colors.clear()
-        global color_index
+        global color_index, queue_version
         color_index = 0
+        queue_version += 1
     print("[*] Conexión del cliente finalizada.")
 
 def simulate_disconnect_action():
@@ -499,6 +779,339 @@ def simulate_disconnect_action():
         client_socket = None
     print("[*] Socket cerrado abruptamente. El servidor debería detectar la desconexión.")
 
+def update_reconnection(dt, velocity_input_box, tiempo_espera_input_box, direction_selected, connection_status_message):
+    """
+    Lógica de reconexión automática, llamada en cada vuelta del bucle principal con
+    el tiempo transcurrido 'dt' (segundos). Retorna el mensaje de estado a mostrar.
+    Un intento cuenta como fallido hasta que el servidor responde CONNECTED: abrir
+    el socket no basta, porque el servidor puede rechazar el ClientID y cerrar.
+    Con varios puentes, el coche pasa a otro tras SHARD_FAILOVER_ATTEMPTS intentos
+    fallidos, o de inmediato si el puente ya no reconoce su ClientID.
+    """
+    global assigned_client_id, color_index, reconnect_attempts, reconnect_timer, queue_version
+
+    if not is_connected:
+        multi_bridge = len(bridge_endpoints) > 1
+        if assigned_client_id != "" and ((client_id_rejected and not multi_bridge) or reconnect_attempts >= MAX_RECONNECT_ATTEMPTS):
+            if client_id_rejected:
+                print(f"[!] El servidor ya no reconoce el ClientID {assigned_client_id}. Desconexión permanente.")
+            else:
+                print("[!] Máximos intentos de reconexión alcanzados. Desconexión permanente.")
+            connection_status_message = "Desconectado. Reconexión fallida."
+            assigned_client_id = "" # Olvidar el ID si la reconexión falla permanentemente
+            with car_status_lock: # Limpiar todos los coches si la reconexión falla permanentemente
+                all_cars_status.clear()
+                queue_snapshot.clear()
+                client_colors.clear()
+                color_index = 0
+                queue_version += 1
+        elif assigned_client_id != "":
+            reconnect_timer += dt
+            if reconnect_timer >= (FIRST_RECONNECT_DELAY if reconnect_attempts == 0 else RECONNECT_DELAY):
+                reconnect_timer = 0 # Reiniciar el timer para el próximo intento
+                reconnect_attempts += 1 # Solo el CONNECTED del servidor lo vuelve a 0
+                print(f"[*] Intentando reconexión ({reconnect_attempts}/{MAX_RECONNECT_ATTEMPTS})...")
+                connection_status_message = f"Intentando reconectar ({reconnect_attempts}/{MAX_RECONNECT_ATTEMPTS})..."
+                if (multi_bridge and (client_id_rejected or reconnect_attempts > SHARD_FAILOVER_ATTEMPTS)
+                        and failover_to_other_bridge(velocity_input_box, tiempo_espera_input_box, direction_selected)):
+                    connection_status_message = f"Conectado a otro puente ({format_endpoint((HOST, PORT))})."
+                elif client_id_rejected:
+                    connection_status_message = "Ningún otro puente disponible; reintentando..." # Reintentar con el ID rechazado no sirve
+                elif attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_selected, is_reconnecting=True):
+                    print("[*] Socket reabierto. Esperando la confirmación del servidor...")
+                    connection_status_message = "Reconectando: esperando confirmación..."
+        elif assigned_client_id == "": # Si no hay ID de cliente asignado (nueva conexión o reconexión fallida)
+            connection_status_message = "Desconectado."
+            # Limpiar la pantalla de coches si no hay un ID de cliente asignado (nueva sesión)
+            with car_status_lock:
+                all_cars_status.clear()
+                queue_snapshot.clear()
+                client_colors.clear()
+                color_index = 0
+                queue_version += 1
+
+    elif reconnect_attempts > 0:
+        connection_status_message = "Reconectando: esperando confirmación..."
+    else:
+        connection_status_message = "Conectado."
+
+    return connection_status_message
+
+# --- Funciones de Dibujo ---
+# Separadas de run_game para que bench_render.py mida el mismo código que se ejecuta en cada frame.
+
+def _mark_phase(phase_times, phase, start):
+    """Acumula en phase_times[phase] el tiempo transcurrido desde 'start' y retorna el instante actual."""
+    now = time.perf_counter()
+    if phase_times is not None:
+        phase_times[phase] = phase_times.get(phase, 0.0) + now - start
+    return now
+
+# --- Vista de Colas ---
+# Los coches WAITING y COOLDOWN se dibujan en rejillas junto al puente, en el orden de la cola que publica el
+# servidor con QUEUE_STATUS (la cabeza de cada cola y su total). Cada rejilla tiene un número fijo de casillas
+# (sprites creados una sola vez) y el resto se resume con "+N más", así el costo del dibujo depende de las
+# casillas visibles y no del tamaño de la cola.
+
+QUEUE_CAR_SIZE = (12, 8)
+QUEUE_CELL_SIZE = (15, 11) # Casilla de cada coche, incluida la separación
+QUEUE_TITLE_HEIGHT = 18
+
+car_surface_cache = {} # Color -> superficie del coche, compartida por todas las casillas de ese color
+queue_text_cache = {} # Texto -> superficie renderizada con QUEUE_FONT
+
+def get_car_surface(color):
+    surface = car_surface_cache.get(color)
+    if surface is None:
+        surface = pygame.Surface(QUEUE_CAR_SIZE).convert()
+        surface.fill(color)
+        car_surface_cache[color] = surface
+    return surface
+
+def render_queue_text(text):
+    surface = queue_text_cache.get(text)
+    if surface is None:
+        if len(queue_text_cache) > 512: # Los contadores cambian sin parar: no dejar crecer la caché indefinidamente
+            queue_text_cache.clear()
+        surface = QUEUE_FONT.render(text, True, BLACK)
+        queue_text_cache[text] = surface
+    return surface
+
+class QueueCarSprite(pygame.sprite.Sprite):
+    def __init__(self, x, y):
+        super().__init__()
+        self.image = None
+        self.rect = pygame.Rect(x, y, *QUEUE_CAR_SIZE)
+
+class QueueLane:
+    """
+    Rejilla de una cola (estado + dirección) en el panel del puente. La cabeza de la cola
+    ocupa la casilla más cercana a la entrada del puente (bridge_side) y la cola crece
+    alejándose de él.
+    """
+    def __init__(self, title, rect, bridge_side, bridge_above):
+        self.title = title
+        self.rect = pygame.Rect(rect)
+        columns = self.rect.width // QUEUE_CELL_SIZE[0]
+        rows = (self.rect.height - QUEUE_TITLE_HEIGHT) // QUEUE_CELL_SIZE[1]
+
+        # El título va en el borde más alejado del puente
+        grid_top = self.rect.y if bridge_above else self.rect.y + QUEUE_TITLE_HEIGHT
+        self.title_y = self.rect.bottom - QUEUE_TITLE_HEIGHT + 2 if bridge_above else self.rect.y
+        self.sprites = []
+        for row in range(rows):
+            y = grid_top + (row if bridge_above else rows - 1 - row) * QUEUE_CELL_SIZE[1]
+            for column in range(columns):
+                x = self.rect.x + (column if bridge_side == "left" else columns - 1 - column) * QUEUE_CELL_SIZE[0]
+                self.sprites.append(QueueCarSprite(x, y))
+        self.capacity = len(self.sprites)
+        self.group = pygame.sprite.Group()
+        self.total = 0
+
+    def update(self, car_ids, total):
+        """
+        Asigna a cada casilla visible la superficie del color de su coche. car_ids es la
+        cabeza de la cola en orden y total el largo de la cola completa.
+        """
+        visible = car_ids[:self.capacity]
+        self.total = max(total, len(car_ids))
+        if len(self.group) != len(visible):
+            self.group.empty()
+            self.group.add(self.sprites[:len(visible)])
+        for sprite, car_id in zip(self.sprites, visible):
+            sprite.image = get_car_surface(get_unique_color(car_id))
+
+    def draw(self, screen):
+        """Dibuja las casillas visibles con un solo Group.draw y el total con "+N más"."""
+        self.group.draw(screen)
+
+        screen.blit(render_queue_text(f"{self.title}: {self.total}"), (self.rect.x, self.title_y))
+        hidden = self.total - len(self.group)
+        if hidden > 0:
+            more_text = render_queue_text(f"+{hidden} más")
+            screen.blit(more_text, (self.rect.right - more_text.get_width(), self.title_y))
+
+def build_queue_lanes(bridge_start_x, bridge_end_x, bridge_y):
+    """
+    Crea las cuatro colas alrededor del puente. Los coches esperan en el extremo por el
+    que entran (arriba) y hacen el cooldown en el extremo por el que salieron (abajo).
+    """
+    lane_width = (bridge_end_x - bridge_start_x) // 2 - 10
+    above = (140, bridge_y - 8 - 140) # Debajo de los textos del coche cruzando
+    below = (bridge_y + 48, HEIGHT - 120 - (bridge_y + 48))
+    west_x = bridge_start_x
+    east_x = bridge_end_x - lane_width
+    return {
+        (CAR_STATE_WAITING, DIRECTION_WEST_EAST): QueueLane("Esperando O-E", (west_x, above[0], lane_width, above[1]), "left", False),
+        (CAR_STATE_WAITING, DIRECTION_EAST_WEST): QueueLane("Esperando E-O", (east_x, above[0], lane_width, above[1]), "right", False),
+        (CAR_STATE_COOLDOWN, DIRECTION_EAST_WEST): QueueLane("Cooldown E-O", (west_x, below[0], lane_width, below[1]), "left", True),
+        (CAR_STATE_COOLDOWN, DIRECTION_WEST_EAST): QueueLane("Cooldown O-E", (east_x, below[0], lane_width, below[1]), "right", True),
+    }
+
+# Misma geometría del puente que usa draw_bridge_panel
+QUEUE_LANES = build_queue_lanes(50, WIDTH // 2 - 50, HEIGHT // 2 - 20)
+queue_lanes_version = None # queue_version con la que se ordenaron las colas por última vez
+crossing_car_ids = [] # Coches que cruzaban en esa versión (su posición se lee en cada frame)
+
+def draw_bridge_panel(screen, cars_status, queues, phase_times=None, cars_version=None):
+    """
+    Dibuja el panel izquierdo: el puente, los coches que cruzan según cars_status
+    (clientId -> estado) y las colas de queues ((estado, dirección) -> (ClientIDs, total)).
+    Retorna el coche que está cruzando (o None).
+    Si se pasa phase_times, acumula ahí el tiempo de cada fase del dibujo.
+    Si se pasa cars_version (queue_version) y no cambió desde el frame anterior, las
+    colas no se vuelven a repartir y solo se consultan los coches que cruzan.
+    """
+    global queue_lanes_version, crossing_car_ids
+    start = time.perf_counter()
+
+    # Dibujar panel izquierdo (Visualización del Puente)
+    pygame.draw.rect(screen, GRAY, (0, 0, WIDTH // 2, HEIGHT))
+    
+    # Puente
+    bridge_y = HEIGHT // 2 - 20
+    pygame.draw.rect(screen, DARK_GRAY, (50, bridge_y, WIDTH // 2 - 100, 40))
+    
+    # Dibujar coches
+    car_width = 30
+    bridge_start_x = 50
+    bridge_end_x = WIDTH // 2 - 50
+    bridge_length_pixels = bridge_end_x - bridge_start_x - car_width
+
+    active_crossing_car = None
+    start = _mark_phase(phase_times, "puente", start)
+
+    # Llenar las colas; los que cruzan se dibujan después para que queden encima
+    if cars_version is None or cars_version != queue_lanes_version:
+        crossing_car_ids = [car_data["clientId"] for car_data in cars_status.values() if car_data["state"] == CAR_STATE_CROSSING]
+        for lane_key, lane in QUEUE_LANES.items():
+            car_ids, total = queues.get(lane_key, ((), 0))
+            # Un coche que ya empezó a cruzar sigue en la cola hasta el próximo QUEUE_STATUS
+            waiting_ids = [car_id for car_id in car_ids if car_id not in crossing_car_ids]
+            lane.update(waiting_ids, total - (len(car_ids) - len(waiting_ids)))
+        queue_lanes_version = cars_version
+
+    for lane in QUEUE_LANES.values():
+        lane.draw(screen)
+
+    start = _mark_phase(phase_times, "esperando", start)
+
+    # Ahora dibujar los coches que están cruzando para que queden encima
+    for car_id in crossing_car_ids:
+        car_data = cars_status.get(car_id)
+        if car_data is None:
+            continue
+        car_pos_logical = car_data["position"]
+        car_direction = car_data["direction"]
+        car_color = get_unique_color(car_id) # Obtener el color del coche
+
+        car_draw_y = bridge_y + 5
+
+        car_draw_x = 0
+        if car_direction == DIRECTION_WEST_EAST:
+            # De Oeste a Este, va de 0 a LENGTH_BRIDGE
+            car_draw_x = bridge_start_x + int((car_pos_logical / LENGTH_BRIDGE) * bridge_length_pixels)
+        elif car_direction == DIRECTION_EAST_WEST:
+            # De Este a Oeste, va de LENGTH_BRIDGE a 0 (visual en la pantalla)
+            car_draw_x = bridge_start_x + bridge_length_pixels - int((car_pos_logical / LENGTH_BRIDGE) * bridge_length_pixels)
+
+        pygame.draw.rect(screen, car_color, (car_draw_x, car_draw_y, car_width, 30))
+
+        # Dibujar borde negro si es el coche actualmente cruzando
+        pygame.draw.rect(screen, BLACK, (car_draw_x, car_draw_y, car_width, 30), 2)
+
+        # Actualizar active_crossing_car si este coche está cruzando
+        active_crossing_car = car_data
+
+    _mark_phase(phase_times, "cruzando", start)
+    return active_crossing_car
+
+def shard_car_color(client_id):
+    """Color fijo por ClientID para la vista combinada (los ID se repiten entre puentes)."""
+    return PREDEFINED_COLORS[zlib.crc32(client_id.encode("utf-8")) % len(PREDEFINED_COLORS)]
+
+def draw_shards_panel(screen, observers, phase_times=None):
+    """
+    Vista combinada: un puente por columna, dibujado con la tabla de coches de su
+    ShardObserver. Retorna el coche que cruza en el puente de este cliente (o None).
+    """
+    start = time.perf_counter()
+    pygame.draw.rect(screen, GRAY, (0, 0, WIDTH // 2, HEIGHT))
+
+    column_width = (WIDTH // 2) // max(1, len(observers))
+    bridge_y = HEIGHT // 2 - 20
+    car_width = 20
+    own_crossing_car = None
+
+    for index, observer in enumerate(observers):
+        cars_status, queues, info, connected = observer.snapshot()
+        x = index * column_width
+        is_own = is_connected and observer.endpoint == (HOST, PORT)
+        if is_own:
+            pygame.draw.rect(screen, SELECTED_DIRECTION_COLOR, (x + 4, 136, column_width - 8, HEIGHT - 256), 3)
+
+        screen.blit(render_queue_text(format_endpoint(observer.endpoint) + (" (este)" if is_own else "")), (x + 10, 144))
+        if connected and info:
+            lines = [f"Coches: {info.get('cars', 0)}", f"En cola: {info.get('waiting', 0)}", f"Dir: {DIRECTION_LABELS.get(info.get('direction'), 'N/A')}"]
+        else:
+            lines = ["Sin conexión"]
+        for line_index, line in enumerate(lines):
+            screen.blit(render_queue_text(line), (x + 10, 164 + line_index * 18))
+
+        bridge_x = x + 10
+        bridge_width = column_width - 20
+        pygame.draw.rect(screen, DARK_GRAY if connected else RED, (bridge_x, bridge_y, bridge_width, 40))
+
+        cooldown_count = sum(total for (state, _), (_, total) in queues.items() if state == CAR_STATE_COOLDOWN)
+        for car_data in cars_status.values():
+            if car_data["state"] != CAR_STATE_CROSSING:
+                continue
+            offset = int((car_data["position"] / LENGTH_BRIDGE) * (bridge_width - car_width))
+            car_x = bridge_x + (offset if car_data["direction"] == DIRECTION_WEST_EAST else bridge_width - car_width - offset)
+            pygame.draw.rect(screen, shard_car_color(car_data["clientId"]), (car_x, bridge_y + 5, car_width, 30))
+            pygame.draw.rect(screen, BLACK, (car_x, bridge_y + 5, car_width, 30), 2)
+            if is_own:
+                own_crossing_car = car_data
+
+        screen.blit(render_queue_text(f"Cooldown: {cooldown_count}"), (x + 10, bridge_y + 50))
+
+    _mark_phase(phase_times, "puente", start)
+    return own_crossing_car
+
+def draw_status_panel(screen, active_crossing_car, connection_status_message, phase_times=None):
+    """Dibuja los textos del panel izquierdo: coche cruzando, estado de la conexión y métricas."""
+    start = time.perf_counter()
+
+    # Mostrar información del coche que está cruzando (o el último que cruzó/está cruzando)
+    current_car_info_y = 50
+    if active_crossing_car and active_crossing_car['state'] == CAR_STATE_CROSSING:
+        crossing_car_text1 = HIGHLIGHT_FONT.render(f"Coche Cruzando: {active_crossing_car['clientId']}", True, BLACK)
+        screen.blit(crossing_car_text1, (50, current_car_info_y))
+
+        crossing_car_text2 = HIGHLIGHT_FONT.render(f"Dir: {DIRECTION_LABELS.get(active_crossing_car['direction'])}", True, BLACK)
+        screen.blit(crossing_car_text2, (50, current_car_info_y + 30))
+
+        crossing_car_text3 = HIGHLIGHT_FONT.render(f"Pos: {active_crossing_car['position']} | Estado: {active_crossing_car['state']}", True, BLACK)
+        screen.blit(crossing_car_text3, (50, current_car_info_y + 60))
+    else:
+        no_car_text = FONT.render("Ningún coche cruzando", True, BLACK)
+        screen.blit(no_car_text, (50, current_car_info_y))
+    
+    # Mostrar estado de la conexión
+    status_text = FONT.render(f"Estado: {connection_status_message}", True, BLACK)
+    screen.blit(status_text, (50, HEIGHT - 50))
+
+    if is_connected:
+        heartbeat = get_heartbeat_metrics()
+        rtt_label = f"{heartbeat['rtt_ms']:.1f} ms" if heartbeat.get("rtt_ms") is not None else "N/A"
+        heartbeat_text = FONT.render(f"RTT: {rtt_label} | Jitter: {heartbeat.get('jitter_ms', 0.0):.1f} ms | Latidos perdidos: {heartbeat.get('missed', 0)}", True, BLACK)
+        screen.blit(heartbeat_text, (50, HEIGHT - 80))
+
+        updates_text = FONT.render(f"CAR_STATUS: {update_stats['received']} | Fusionados: {update_stats['conflated']} | Contrapresión: {'Sí' if is_backpressure_active() else 'No'}", True, BLACK)
+        screen.blit(updates_text, (50, HEIGHT - 110))
+
+    _mark_phase(phase_times, "textos", start)
+
 # --- Función Principal de Pygame ---
 
 def run_game(initial_velocity=None, initial_cooldown=None, initial_direction=None):
@@ -551,16 +1164,20 @@ def run_game(initial_velocity=None, initial_cooldown=None, initial_direction=Non
     terminate_connection_button.set_enabled(False)
     simulate_drop_button.set_enabled(False)
 
+    if combined_view:
+        shard_observers[:] = [ShardObserver(endpoint).start() for endpoint in bridge_endpoints]
+
     running = True
     clock = pygame.time.Clock()
 
     connection_status_message = "" # Mensaje a mostrar al usuario
     last_update_time = pygame.time.get_ticks() # Para control del timer de reconexión
+    last_fps_check = pygame.time.get_ticks() # Para decidir la contrapresión según los FPS
 
     # Conexión automática si se pasaron argumentos
     if initial_velocity is not None and initial_cooldown is not None and initial_direction is not None:
         print("[*] Argumentos de inicio detectados. Intentando conexión automática...")
-        if attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_selected, is_reconnecting=False):
+        if connect_to_bridge(velocity_input_box, tiempo_espera_input_box, direction_selected):
             print("[*] Conexión inicial automática exitosa.")
             connection_status_message = "Conectado automáticamente."
         else:
@@ -606,36 +1223,7 @@ def run_game(initial_velocity=None, initial_cooldown=None, initial_direction=Non
                 box.handle_event(event)
 
         # --- Lógica de reconexión automática ---
-        if not is_connected:
-            if assigned_client_id != "" and reconnect_attempts < MAX_RECONNECT_ATTEMPTS:
-                reconnect_timer += dt
-                if reconnect_timer >= RECONNECT_DELAY:
-                    print(f"[*] Intentando reconexión ({reconnect_attempts + 1}/{MAX_RECONNECT_ATTEMPTS})...")
-                    connection_status_message = f"Intentando reconectar ({reconnect_attempts + 1}/{MAX_RECONNECT_ATTEMPTS})..."
-                    if attempt_connection(velocity_input_box, tiempo_espera_input_box, direction_selected, is_reconnecting=True):
-                        print("[*] ¡Reconexión exitosa!")
-                        connection_status_message = "Conectado."
-                    else:
-                        reconnect_attempts += 1
-                        reconnect_timer = 0 # Reiniciar el timer para el próximo intento
-                        if reconnect_attempts >= MAX_RECONNECT_ATTEMPTS:
-                            print("[!] Máximos intentos de reconexión alcanzados. Desconexión permanente.")
-                            connection_status_message = "Desconectado. Reconexión fallida."
-                            assigned_client_id = "" # Olvidar el ID si la reconexión falla permanentemente
-                            with car_status_lock: # Limpiar todos los coches si la reconexión falla permanentemente
-                                all_cars_status.clear()
-                                client_colors.clear()
-                                color_index = 0
-            elif assigned_client_id == "": # Si no hay ID de cliente asignado (nueva conexión o reconexión fallida)
-                connection_status_message = "Desconectado."
-                # Limpiar la pantalla de coches si no hay un ID de cliente asignado (nueva sesión)
-                with car_status_lock:
-                    all_cars_status.clear()
-                    client_colors.clear()
-                    color_index = 0
-
-        elif is_connected:
-            connection_status_message = "Conectado."
+        connection_status_message = update_reconnection(dt, velocity_input_box, tiempo_espera_input_box, direction_selected, connection_status_message)
 
 
         # --- Actualizar Estado de la UI ---
@@ -670,94 +1258,15 @@ def run_game(initial_velocity=None, initial_cooldown=None, initial_direction=Non
         # --- Dibujo ---
         SCREEN.fill(LIGHT_GRAY)
 
-        # Dibujar panel izquierdo (Visualización del Puente)
-        pygame.draw.rect(SCREEN, GRAY, (0, 0, WIDTH // 2, HEIGHT))
-        
-        # Puente
-        bridge_y = HEIGHT // 2 - 20
-        pygame.draw.rect(SCREEN, DARK_GRAY, (50, bridge_y, WIDTH // 2 - 100, 40))
-        
-        # Dibujar coches
-        car_width = 30
-        bridge_start_x = 50
-        bridge_end_x = WIDTH // 2 - 50
-        bridge_length_pixels = bridge_end_x - bridge_start_x - car_width
-
-        active_crossing_car = None
-
         with car_status_lock:
-            # Crea una copia para iterar y evitar errores si el diccionario cambia durante el bucle
-            # Es importante copiar el diccionario DE all_cars_status antes de la iteración
-            current_cars_status = list(all_cars_status.values()) 
-            
-            # Dibujar primero los coches que no están cruzando, para que los que cruzan estén encima
-            for car_data in current_cars_status:
-                car_id = car_data["clientId"]
-                car_state = car_data["state"]
-                car_color = get_unique_color(car_id) # Obtener el color del coche
-
-                # Para coches en estado WAITING o COOLDOWN, puedes dibujarlos fuera del puente
-                if car_state == CAR_STATE_WAITING:
-                    if car_data["direction"] == DIRECTION_WEST_EAST:
-                        pygame.draw.rect(SCREEN, car_color, (bridge_start_x - car_width - 10, bridge_y + 5, car_width, 30))
-                    elif car_data["direction"] == DIRECTION_EAST_WEST:
-                        pygame.draw.rect(SCREEN, car_color, (bridge_end_x + 10, bridge_y + 5, car_width, 30))
-                
-                elif car_state == CAR_STATE_COOLDOWN:
-                    # Si el backend sigue enviando COOLDOWN después de terminar, dibújalos.
-                    # Si el coche se elimina con MSG_CAR_END, esta sección no se ejecutará para él.
-                    if car_data["direction"] == DIRECTION_WEST_EAST:
-                        pygame.draw.rect(SCREEN, car_color, (bridge_end_x + 10, bridge_y + 5, car_width, 30))
-                    elif car_data["direction"] == DIRECTION_EAST_WEST:
-                        pygame.draw.rect(SCREEN, car_color, (bridge_start_x - car_width - 10, bridge_y + 5, car_width, 30))
-
-
-            # Ahora dibujar los coches que están cruzando para que queden encima
-            for car_data in current_cars_status:
-                car_id = car_data["clientId"]
-                car_pos_logical = car_data["position"]
-                car_direction = car_data["direction"]
-                car_state = car_data["state"]
-                car_color = get_unique_color(car_id) # Obtener el color del coche
-                
-                if car_state == CAR_STATE_CROSSING:
-                    car_draw_y = bridge_y + 5
-
-                    car_draw_x = 0
-                    if car_direction == DIRECTION_WEST_EAST:
-                        # De Oeste a Este, va de 0 a LENGTH_BRIDGE
-                        car_draw_x = bridge_start_x + int((car_pos_logical / LENGTH_BRIDGE) * bridge_length_pixels)
-                    elif car_direction == DIRECTION_EAST_WEST:
-                        # De Este a Oeste, va de LENGTH_BRIDGE a 0 (visual en la pantalla)
-                        car_draw_x = bridge_start_x + bridge_length_pixels - int((car_pos_logical / LENGTH_BRIDGE) * bridge_length_pixels)
-                    
-                    pygame.draw.rect(SCREEN, car_color, (car_draw_x, car_draw_y, car_width, 30))
-                    
-                    # Dibujar borde negro si es el coche actualmente cruzando
-                    pygame.draw.rect(SCREEN, BLACK, (car_draw_x, car_draw_y, car_width, 30), 2)
-                    
-                    # Actualizar active_crossing_car si este coche está cruzando
-                    active_crossing_car = car_data 
-
-
-        # Mostrar información del coche que está cruzando (o el último que cruzó/está cruzando)
-        current_car_info_y = 50
-        if active_crossing_car and active_crossing_car['state'] == CAR_STATE_CROSSING:
-            crossing_car_text1 = HIGHLIGHT_FONT.render(f"Coche Cruzando: {active_crossing_car['clientId']}", True, BLACK)
-            SCREEN.blit(crossing_car_text1, (50, current_car_info_y))
-
-            crossing_car_text2 = HIGHLIGHT_FONT.render(f"Dir: {DIRECTION_LABELS.get(active_crossing_car['direction'])}", True, BLACK)
-            SCREEN.blit(crossing_car_text2, (50, current_car_info_y + 30))
-
-            crossing_car_text3 = HIGHLIGHT_FONT.render(f"Pos: {active_crossing_car['position']} | Estado: {active_crossing_car['state']}", True, BLACK)
-            SCREEN.blit(crossing_car_text3, (50, current_car_info_y + 60))
-        else:
-            no_car_text = FONT.render("Ningún coche cruzando", True, BLACK)
-            SCREEN.blit(no_car_text, (50, current_car_info_y))
-        
-        # Mostrar estado de la conexión
-        status_text = FONT.render(f"Estado: {connection_status_message}", True, BLACK)
-        SCREEN.blit(status_text, (50, HEIGHT - 50))
+            # Se dibuja con el lock tomado, así el diccionario no cambia durante el recorrido
+            frame_traces = latency_tracer.take_pending(time.time_ns())
+            if not combined_view:
+                active_crossing_car = draw_bridge_panel(SCREEN, all_cars_status, queue_snapshot, cars_version=queue_version)
+        if combined_view:
+            active_crossing_car = draw_shards_panel(SCREEN, shard_observers)
+
+        draw_status_panel(SCREEN, active_crossing_car, connection_status_message)
 
 
         # Dibujar panel derecho (Formulario)
@@ -766,7 +1275,10 @@ def run_game(initial_velocity=None, initial_cooldown=None, initial_direction=Non
         title_surf = TITLE_FONT.render("Controles del Coche", True, BLACK)
         SCREEN.blit(title_surf, (WIDTH // 2 + 30, 30))
 
-        client_id_surf = FONT.render(f"ID Cliente: {assigned_client_id if assigned_client_id else 'N/A'}", True, BLACK)
+        client_id_label = assigned_client_id if assigned_client_id else 'N/A'
+        if len(bridge_endpoints) > 1:
+            client_id_label += f" @ {format_endpoint((HOST, PORT))}"
+        client_id_surf = FONT.render(f"ID Cliente: {client_id_label}", True, BLACK)
         SCREEN.blit(client_id_surf, (WIDTH // 2 + 30, 80))
 
         dir_label = FONT.render("Dirección:", True, BLACK)
@@ -792,8 +1304,18 @@ def run_game(initial_velocity=None, initial_cooldown=None, initial_direction=Non
             # Los botones de dirección ya se dibujan antes de este 'else' y su estado se maneja con set_enabled
 
         pygame.display.flip()
+        latency_tracer.complete(frame_traces, time.time_ns())
         clock.tick(60)
 
+        # Si no llegamos a dibujar a tiempo, pedir al servidor que retenga actualizaciones
+        if is_connected and pygame.time.get_ticks() - last_fps_check >= 1000:
+            last_fps_check = pygame.time.get_ticks()
+            fps = clock.get_fps()
+            if fps and fps < BACKPRESSURE_MIN_FPS:
+                set_update_rate(backpressure_source="render", active=True)
+            elif fps >= BACKPRESSURE_RELEASE_FPS:
+                set_update_rate(backpressure_source="render", active=False)
+
     # Limpieza final antes de salir
     if client_socket:
         print("[*] Cerrando socket del cliente.")
@@ -810,27 +1332,53 @@ def run_game(initial_velocity=None, initial_cooldown=None, initial_direction=Non
         network_thread.join(timeout=1.0)
         if network_thread.is_alive():
             print("[!] El hilo de red no terminó a tiempo al cerrar.")
+
+    for observer in shard_observers:
+        observer.stop()
+    if load_monitor:
+        load_monitor.stop()
+
+    if latency_tracer.enabled:
+        print("[*] Latencia tick del servidor -> pixel:")
+        print(latency_tracer.format_summary())
+        if trace_output_path:
+            latency_tracer.export_chrome_trace(trace_output_path)
+            print(f"[*] Trazas exportadas en formato Chrome trace-event a {trace_output_path}")
     
     pygame.quit()
     sys.exit()
 
 # --- Función principal de ejecución ---
 if __name__ == "__main__":
-    initial_velocity_arg = None
-    initial_cooldown_arg = None
-    initial_direction_arg = None
+    parser = argparse.ArgumentParser(description="Cliente del simulador de puente.",
+                                     usage="python client.py [velocidad_inicial tiempo_espera_inicial direccion_inicial] [opciones]")
+    parser.add_argument("velocity", nargs="?", type=int, help="Velocidad inicial (conexión automática)")
+    parser.add_argument("cooldown", nargs="?", type=int, help="Tiempo de espera inicial (conexión automática)")
+    parser.add_argument("direction", nargs="?", choices=[DIRECTION_EAST_WEST, DIRECTION_WEST_EAST], help="Dirección inicial (conexión automática)")
+    parser.add_argument("--trace", action="store_true", help="Pedir marcas de tiempo en los CAR_STATUS y medir la latencia por etapa")
+    parser.add_argument("--trace-out", metavar="ARCHIVO", help="Exportar las trazas en formato Chrome trace-event al salir (implica --trace)")
+    parser.add_argument("--bridges", default=format_endpoint((HOST, PORT)), metavar="HOST:PUERTO[,...]", help="Puentes disponibles, separados por comas")
+    parser.add_argument("--placement", choices=[PLACEMENT_HASH, PLACEMENT_LEAST_LOADED], default=PLACEMENT_HASH, help="Cómo se elige el puente del coche")
+    parser.add_argument("--client-key", help="Clave del cliente para el hashing consistente (por defecto, aleatoria)")
+    parser.add_argument("--combined-view", action="store_true", help="Dibujar todos los puentes lado a lado")
+    parser.add_argument("--heartbeat-interval", type=float, default=HEARTBEAT_INTERVAL, metavar="SEGUNDOS", help="Segundos entre PINGs")
+    parser.add_argument("--heartbeat-max-misses", type=int, default=HEARTBEAT_MAX_MISSES, metavar="N", help="PONGs sin respuesta antes de dar la conexión por perdida")
+    args = parser.parse_args()
+
+    if args.heartbeat_interval <= 0 or args.heartbeat_max_misses <= 0:
+        parser.error("--heartbeat-interval y --heartbeat-max-misses deben ser mayores que 0")
+    HEARTBEAT_INTERVAL = args.heartbeat_interval
+    HEARTBEAT_MAX_MISSES = args.heartbeat_max_misses
+
+    latency_tracer.enabled = args.trace or args.trace_out is not None
+    trace_output_path = args.trace_out
+    try:
+        configure_bridges(parse_endpoints(args.bridges), args.placement, args.client_key)
+    except ValueError as e:
+        parser.error(str(e))
+    combined_view = args.combined_view
 
-    if len(sys.argv) > 3:
-        try:
-            initial_velocity_arg = int(sys.argv[1])
-            initial_cooldown_arg = int(sys.argv[2])
-            initial_direction_arg = sys.argv[3]
-            if initial_direction_arg not in [DIRECTION_EAST_WEST, DIRECTION_WEST_EAST]:
-                print(f"Error: Dirección inválida. Use '{DIRECTION_EAST_WEST}' o '{DIRECTION_WEST_EAST}'.")
-                sys.exit(1)
-        except ValueError:
-            print("Uso: python client_pygame.py [velocidad_inicial] [tiempo_espera_inicial] [direccion_inicial]")
-            print("Los argumentos deben ser números enteros y una dirección válida.")
-            sys.exit(1)
-    
-    run_game(initial_velocity_arg, initial_cooldown_arg, initial_direction_arg)
\ No newline at end of file
+    if args.direction is not None:
+        run_game(args.velocity, args.cooldown, args.direction)
+    else:
+        run_game()
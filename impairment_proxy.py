@@ -0,0 +1,371 @@
+"""
+Proxy TCP local que degrada la red entre client.py y el servidor.
+
+Se coloca entre el cliente y el servidor (cliente -> proxy -> servidor) y,
+según un escenario, inyecta en cada sentido:
+- delay_ms / jitter_ms: retraso fijo más una variación aleatoria por bloque.
+- loss: probabilidad de "perder" un bloque. TCP retransmite, así que se
+  simula como un retraso extra de LOSS_RETRANSMIT_MS (lo que ve la aplicación).
+- bandwidth_bps: tope de bytes por segundo (lecturas lentas).
+Y eventos en el tiempo:
+- set: cambia los parámetros anteriores desde ese instante.
+- stall: deja de reenviar durante 'duration' segundos sin cerrar la conexión.
+- blackhole: como stall, pero además las conexiones nuevas quedan mudas
+  (conexión medio abierta: el connect funciona y nunca llegan datos).
+- reset: cierra las conexiones activas con RST.
+Cada sentido retiene como mucho MAX_QUEUED_BYTES sin reenviar: con la cola llena
+el proxy deja de leer, así un stall o un tope de ancho de banda llegan al emisor
+como contrapresión de TCP (su buffer de envío se llena) y no como memoria sin
+límite en el proxy.
+
+Formato del escenario (JSON):
+    {
+      "name": "perdida_y_reset",
+      "default": {"delay_ms": 5, "jitter_ms": 2},
+      "events": [
+        {"at": 2.0, "action": "set", "direction": "downstream", "delay_ms": 300, "loss": 0.1},
+        {"at": 4.0, "action": "stall", "duration": 1.5},
+        {"at": 7.0, "action": "reset"}
+      ]
+    }
+'direction' es "upstream" (cliente -> servidor), "downstream" (servidor ->
+cliente) o "both" (por defecto). Los instantes 'at' se cuentan desde
+start_scenario().
+
+Uso desde Python:
+    with ImpairmentProxy(("localhost", 12345), listen_port=0) as proxy:
+        client.PORT = proxy.port
+        proxy.start_scenario(load_scenario("escenario.json"))
+        ...
+
+Uso desde la línea de comandos:
+    python impairment_proxy.py escenario.json [--name nombre] [--listen 12346] [--target localhost:12345]
+"""
+import argparse
+import heapq
+import json
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+
+UPSTREAM = "upstream"
+DOWNSTREAM = "downstream"
+DIRECTIONS = (UPSTREAM, DOWNSTREAM)
+
+LOSS_RETRANSMIT_MS = 200 # Retraso que añade una retransmisión de TCP (RTO mínimo típico)
+CHUNK_SIZE = 4096
+MAX_QUEUED_BYTES = 64 * 1024 # Bytes leídos y todavía no reenviados, por sentido de cada conexión
+
+DEFAULT_IMPAIRMENT = {"delay_ms": 0.0, "jitter_ms": 0.0, "loss": 0.0, "bandwidth_bps": 0}
+
+
+def load_scenario(path):
+    with open(path, encoding="utf-8") as scenario_file:
+        return json.load(scenario_file)
+
+
+def _event_directions(event):
+    direction = event.get("direction", "both")
+    return DIRECTIONS if direction == "both" else (direction,)
+
+
+class _Pipe:
+    """Reenvía un sentido de una conexión aplicando los parámetros actuales del proxy."""
+
+    def __init__(self, proxy, connection, direction, source, destination):
+        self.proxy = proxy
+        self.connection = connection
+        self.direction = direction
+        self.source = source
+        self.destination = destination
+        self.queue = [] # (instante de entrega, orden, datos)
+        self.queued_bytes = 0 # Suma de los datos en queue
+        self.cond = threading.Condition()
+        self.closed = False
+        self.last_release = 0.0
+        self.seq = 0
+
+    def start(self):
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def _read_loop(self):
+        while not self.closed:
+            with self.cond:
+                # Cola llena: no leer más hasta que _write_loop reenvíe algo
+                while self.queued_bytes >= MAX_QUEUED_BYTES and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+            try:
+                data = self.source.recv(CHUNK_SIZE)
+            except OSError:
+                data = b""
+            if not data:
+                self.proxy._close_connection(self)
+                return
+
+            params = self.proxy.params(self.direction)
+            delay = params["delay_ms"] + random.uniform(-params["jitter_ms"], params["jitter_ms"])
+            if params["loss"] and random.random() < params["loss"]:
+                delay += LOSS_RETRANSMIT_MS
+            # TCP entrega en orden: un bloque nunca sale antes que el anterior
+            release = max(time.monotonic() + max(0.0, delay) / 1000, self.last_release)
+            self.last_release = release
+
+            with self.cond:
+                self.seq += 1
+                heapq.heappush(self.queue, (release, self.seq, data))
+                self.queued_bytes += len(data)
+                self.cond.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self.cond:
+                while not self.closed:
+                    # Sin datos (o silenciada para siempre) se espera sin timeout: _read_loop y close() avisan
+                    if not self.queue:
+                        wait = None
+                    else:
+                        stalled_for = self.proxy.stall_remaining(self)
+                        wait = stalled_for if stalled_for > 0 else self.queue[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        if wait == float("inf"):
+                            wait = None
+                    self.cond.wait(wait)
+                if self.closed:
+                    return
+                _, _, data = heapq.heappop(self.queue)
+                self.queued_bytes -= len(data)
+                self.cond.notify_all() # _read_loop puede estar esperando lugar en la cola
+
+            bandwidth = self.proxy.params(self.direction)["bandwidth_bps"]
+            try:
+                if bandwidth:
+                    # Envío en trozos pequeños para respetar el tope de forma uniforme
+                    for offset in range(0, len(data), 256):
+                        piece = data[offset:offset + 256]
+                        self.destination.sendall(piece)
+                        time.sleep(len(piece) / bandwidth)
+                else:
+                    self.destination.sendall(data)
+            except OSError:
+                self.proxy._close_connection(self)
+                return
+
+
+class _Connection:
+    def __init__(self, client_sock, server_sock, muted):
+        self.client_sock = client_sock
+        self.server_sock = server_sock
+        self.muted = muted # Abierta durante un blackhole: nunca reenvía
+        self.pipes = []
+        self.closed = False
+
+
+class ImpairmentProxy:
+    def __init__(self, target, listen_host="localhost", listen_port=0):
+        self.target = target
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.port = None
+        self.events_log = [] # (instante monotonic, evento) de los eventos ya aplicados
+        self._lock = threading.Lock()
+        self._params = {direction: dict(DEFAULT_IMPAIRMENT) for direction in DIRECTIONS}
+        self._stalled_until = {direction: 0.0 for direction in DIRECTIONS}
+        self._blackhole_until = 0.0
+        self._connections = []
+        self._server = None
+        self._running = False
+        self._scenario_thread = None
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.listen_host, self.listen_port))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._server:
+            self._server.close()
+        for connection in list(self._connections):
+            self._close(connection, reset=False)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- Escenarios ---
+
+    def start_scenario(self, scenario, on_event=None):
+        """
+        Aplica los parámetros por defecto del escenario y programa sus eventos.
+        on_event(evento, instante_monotonic) se llama al aplicar cada evento.
+        """
+        with self._lock:
+            for direction in DIRECTIONS:
+                self._params[direction] = dict(DEFAULT_IMPAIRMENT, **scenario.get("default", {}))
+        events = sorted(scenario.get("events", []), key=lambda event: event["at"])
+        start = time.monotonic()
+
+        def run():
+            for event in events:
+                delay = start + event["at"] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if not self._running:
+                    return
+                applied_at = self.apply_event(event)
+                if on_event:
+                    on_event(event, applied_at)
+
+        self._scenario_thread = threading.Thread(target=run, daemon=True)
+        self._scenario_thread.start()
+        return start
+
+    def wait_scenario(self, timeout=None):
+        if self._scenario_thread:
+            self._scenario_thread.join(timeout)
+
+    def apply_event(self, event):
+        """Aplica un evento de inmediato. Retorna el instante (monotonic) en que se aplicó."""
+        now = time.monotonic()
+        action = event["action"]
+        with self._lock:
+            if action == "set":
+                for direction in _event_directions(event):
+                    for key in DEFAULT_IMPAIRMENT:
+                        if key in event:
+                            self._params[direction][key] = event[key]
+            elif action == "stall":
+                for direction in _event_directions(event):
+                    self._stalled_until[direction] = now + event.get("duration", 0)
+            elif action == "blackhole":
+                self._blackhole_until = now + event.get("duration", 0)
+                for connection in self._connections:
+                    connection.muted = True
+            elif action != "reset":
+                raise ValueError(f"Acción de escenario desconocida: {action}")
+            connections = list(self._connections)
+            self.events_log.append((now, event))
+
+        if action == "reset":
+            for connection in connections:
+                self._close(connection, reset=True)
+        return now
+
+    def params(self, direction):
+        with self._lock:
+            return self._params[direction]
+
+    def stall_remaining(self, pipe):
+        """Segundos que el sentido seguirá detenido: 0 si reenvía, infinito si la conexión está silenciada."""
+        with self._lock:
+            if pipe.connection.muted:
+                return float("inf")
+            return max(0.0, self._stalled_until[pipe.direction] - time.monotonic())
+
+    # --- Internos ---
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client_sock, _ = self._server.accept()
+            except OSError:
+                return
+            try:
+                server_sock = socket.create_connection(self.target)
+            except OSError:
+                self._reset_socket(client_sock)
+                continue
+
+            with self._lock:
+                connection = _Connection(client_sock, server_sock, muted=time.monotonic() < self._blackhole_until)
+                self._connections.append(connection)
+            for direction, source, destination in ((UPSTREAM, client_sock, server_sock), (DOWNSTREAM, server_sock, client_sock)):
+                pipe = _Pipe(self, connection, direction, source, destination)
+                connection.pipes.append(pipe)
+                pipe.start()
+
+    def _close_connection(self, pipe):
+        self._close(pipe.connection, reset=False)
+
+    def _close(self, connection, reset):
+        with self._lock:
+            if connection.closed:
+                return
+            connection.closed = True
+            if connection in self._connections:
+                self._connections.remove(connection)
+        for pipe in connection.pipes:
+            pipe.close()
+        for sock in (connection.client_sock, connection.server_sock):
+            if reset:
+                self._reset_socket(sock)
+            else:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _reset_socket(sock):
+        """Cierra con RST en lugar de FIN (SO_LINGER con tiempo 0)."""
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        except OSError:
+            pass
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy TCP que degrada la red según un escenario.")
+    parser.add_argument("scenario", help="Archivo JSON con el escenario")
+    parser.add_argument("--listen", type=int, default=12346, help="Puerto local del proxy")
+    parser.add_argument("--target", default="localhost:12345", help="Servidor destino host:puerto")
+    parser.add_argument("--name", help="Escenario a usar si el archivo contiene una lista (por defecto, el primero)")
+    args = parser.parse_args()
+
+    host, port = args.target.rsplit(":", 1)
+    scenarios = load_scenario(args.scenario)
+    scenarios = scenarios if isinstance(scenarios, list) else [scenarios]
+    if args.name:
+        scenarios = [scenario for scenario in scenarios if scenario.get("name") == args.name]
+        if not scenarios:
+            parser.error(f"No hay un escenario llamado '{args.name}' en {args.scenario}")
+    scenario = scenarios[0]
+
+    with ImpairmentProxy((host, int(port)), listen_port=args.listen) as proxy:
+        print(f"[*] Proxy escuchando en localhost:{proxy.port} -> {args.target} (escenario '{scenario.get('name', args.scenario)}')")
+        proxy.start_scenario(scenario, on_event=lambda event, _: print(f"[*] Evento aplicado: {event}"))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("[*] Proxy detenido.")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Lanza varios puentes (un server.go por puerto) y reparte clientes entre ellos.
+
+Cada servidor se inicia con -puerto y sin sus propios clientes aleatorios
+(-clientes -1); los clientes se lanzan desde aquí con la lista completa de
+puentes, así que client.py elige el suyo (hashing consistente o el menos
+cargado) y pasa a otro si su puente cae.
+
+Uso:
+    python launch_bridges.py [--bridges 3] [--clients 10] [--base-port 12345]
+                             [--placement hash|least-loaded] [--server-bin ./server]
+                             [--combined-view]
+Ctrl+C detiene todos los procesos.
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from sharding import format_endpoint
+
+SERVER_START_TIMEOUT = 60 # Segundos; "go run" compila antes de escuchar
+CLIENT_SPAWN_INTERVAL = 0.1
+
+
+def wait_for_port(endpoint, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(endpoint, timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lanza varios puentes y reparte clientes entre ellos.")
+    parser.add_argument("--bridges", type=int, default=3, help="Cantidad de servidores")
+    parser.add_argument("--clients", type=int, default=10, help="Cantidad de clientes a lanzar")
+    parser.add_argument("--base-port", type=int, default=12345, help="Puerto del primer servidor (los demás son consecutivos)")
+    parser.add_argument("--placement", choices=["hash", "least-loaded"], default="hash", help="Estrategia de colocación de los clientes")
+    parser.add_argument("--server-bin", help="Ejecutable del servidor ya compilado (por defecto: go run server.go)")
+    parser.add_argument("--combined-view", action="store_true", help="El primer cliente muestra todos los puentes lado a lado")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    server_cmd = [args.server_bin] if args.server_bin else ["go", "run", "server.go"]
+    endpoints = [("localhost", args.base_port + i) for i in range(args.bridges)]
+    bridges_arg = ",".join(format_endpoint(endpoint) for endpoint in endpoints)
+
+    processes = []
+    try:
+        for _, port in endpoints:
+            print(f"[*] Iniciando puente en el puerto {port}...")
+            processes.append(subprocess.Popen(server_cmd + ["-puerto", str(port), "-clientes", "-1"], cwd=here))
+        for endpoint in endpoints:
+            if not wait_for_port(endpoint, SERVER_START_TIMEOUT):
+                print(f"[!] El puente {format_endpoint(endpoint)} no empezó a escuchar a tiempo.")
+                return 1
+
+        for i in range(args.clients):
+            velocity = random.randint(20, 59)
+            cooldown = random.randint(2, 11)
+            direction = random.choice(["EAST_TO_WEST", "WEST_TO_EAST"])
+            client_cmd = [sys.executable, "client.py", str(velocity), str(cooldown), direction,
+                          "--bridges", bridges_arg, "--placement", args.placement]
+            if args.combined_view and i == 0:
+                client_cmd.append("--combined-view")
+            print("[*] " + " ".join(client_cmd[1:]))
+            processes.append(subprocess.Popen(client_cmd, cwd=here))
+            time.sleep(CLIENT_SPAWN_INTERVAL)
+
+        print(f"[*] {args.bridges} puentes y {args.clients} clientes en ejecución. Ctrl+C para detener.")
+        while any(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n[*] Deteniendo puentes y clientes...")
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+package main
+
+// Benchmark del Planificador de server.go: decisiones/segundo vs. largo de la cola.
+// Mismo escenario que bench_scheduler.py: N-1 coches en cooldown y 1 listo; cada
+// decisión elige el coche listo y lo vuelve a dejar elegible con EnCooldown(0).
+//
+// Uso: go test -run '^$' -bench Planificador server.go planificador_bench_test.go
+
+import (
+	"fmt"
+	"testing"
+	"time"
+)
+
+var largosDeCola = []int{10, 100, 1000, 10000}
+
+func BenchmarkPlanificadorSiguiente(b *testing.B) {
+	for _, n := range largosDeCola {
+		b.Run(fmt.Sprintf("cola=%d", n), func(b *testing.B) {
+			p := NuevoPlanificador()
+			for i := 0; i < n-1; i++ {
+				p.EnCooldown(&Car{ClientID: "Client-" + fmt.Sprint(i), Direction: DIRECTION_EAST_WEST}, time.Hour)
+			}
+			p.Encolar(&Car{ClientID: "listo", Direction: DIRECTION_EAST_WEST})
+
+			b.ResetTimer()
+			for i := 0; i < b.N; i++ {
+				car := p.Siguiente(DIRECTION_EAST_WEST)
+				p.EnCooldown(car, 0)
+			}
+			b.ReportMetric(float64(b.N)/b.Elapsed().Seconds(), "dec/s")
+		})
+	}
+}
+
+// Rotación completa: todos los coches listos; cada decisión manda al elegido a un
+// cooldown corto, así el heap y las colas de listos cambian en cada iteración
+func BenchmarkPlanificadorRotacion(b *testing.B) {
+	for _, n := range largosDeCola {
+		b.Run(fmt.Sprintf("cola=%d", n), func(b *testing.B) {
+			p := NuevoPlanificador()
+			for i := 0; i < n; i++ {
+				direccion := DIRECTION_EAST_WEST
+				if i%2 == 1 {
+					direccion = DIRECTION_WEST_EAST
+				}
+				p.Encolar(&Car{ClientID: "Client-" + fmt.Sprint(i), Direction: direccion})
+			}
+
+			b.ResetTimer()
+			direccionActual := DIRECTION_NONE
+			for i := 0; i < b.N; i++ {
+				car := p.Siguiente(direccionActual)
+				direccionActual = car.Direction
+				p.EnCooldown(car, time.Nanosecond)
+			}
+			b.ReportMetric(float64(b.N)/b.Elapsed().Seconds(), "dec/s")
+		})
+	}
+}
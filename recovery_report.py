@@ -0,0 +1,379 @@
+"""
+Reporte de recuperación de client.py ante fallas de red.
+
+Para cada escenario de impairment_scenarios.json conecta el cliente real
+(attempt_connection / update_reconnection de client.py, sin ventana) a un
+servidor a través de ImpairmentProxy y mide:
+- detección: desde el primer evento disruptivo (stall, blackhole, reset) hasta
+  que el cliente se da cuenta (is_connected pasa a False).
+- reconexión: desde la detección hasta que el servidor confirma la nueva
+  conexión con CONNECTED.
+- resincronización: desde la reconexión hasta que llega un CAR_STATUS del
+  propio coche, conservando el ClientID. Si server.go no llegó a notar la
+  caída, el próximo llega con el siguiente paso del puente (hasta 1 s).
+
+Por defecto compila e inicia server.go en un puerto libre (o el ejecutable de
+--server-bin) y lo detiene al terminar. Con --server host:puerto se mide contra
+un servidor ya iniciado, y con --local contra LocalBridgeServer, una réplica en
+Python para cuando no hay Go instalado; con ella también se verifica que la
+posición recibida sea la última difundida.
+
+Uso: python recovery_report.py [escenarios.json] [--only nombre] [--server host:puerto | --server-bin ./server | --local] [--verbose]
+Retorna 1 si algún escenario no cumple su bloque "expect".
+"""
+import os
+
+# Debe definirse antes de importar client.py, que inicializa Pygame al importarse
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import contextlib
+import io
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import client
+from impairment_proxy import ImpairmentProxy, load_scenario
+from launch_bridges import SERVER_START_TIMEOUT, wait_for_port
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCENARIOS = os.path.join(HERE, "impairment_scenarios.json")
+DISRUPTIVE_ACTIONS = ("stall", "blackhole", "reset")
+SETTLE_SECONDS = 4.0 # Tiempo de observación tras el último evento del escenario
+POLL_INTERVAL = 0.005
+
+
+class LocalBridgeServer:
+    """
+    Réplica reducida de server.go para medir sin Go instalado (--local). Como el
+    servidor real: cruza un coche a la vez y solo se difunde el CAR_STATUS del
+    que cruza, entre CAR_START y CAR_END; el plazo de lectura sale de
+    heartbeatIntervalMs y heartbeatMaxMisses; un ClientID desconocido recibe
+    ERROR UNKNOWN_CLIENT; y lo difundido a un coche desconectado se retiene y se
+    envía después del CONNECTED. Cada paso dura STEP segundos (un segundo en
+    server.go) y no hay cooldown ni vencimiento de la desconexión.
+    """
+
+    STEP = 0.1
+    STEP_LENGTH = 30
+    MIN_HEARTBEAT_INTERVAL = 0.05 # MIN_INTERVALO_LATIDO de server.go
+
+    def __init__(self, host="localhost", port=0):
+        self.host = host
+        self.port = port
+        self.positions = {} # ClientID -> posiciones difundidas en los dos últimos CAR_STATUS (anterior, actual)
+        self._connections = {} # ClientID -> socket actual (None mientras está desconectado)
+        self._pending = {} # ClientID -> mensajes retenidos mientras está desconectado
+        self._order = [] # Orden de cruce
+        self._crossing = None # ClientID del coche que cruza
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._running = False
+        self._server = None
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._bridge_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._server.close()
+
+    def current_positions(self, client_id):
+        with self._lock:
+            return self.positions.get(client_id, ())
+
+    def _send(self, sock, message):
+        try:
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            return True
+        except OSError:
+            return False
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(sock,), daemon=True).start()
+
+    def _handle(self, sock):
+        reader = sock.makefile("r", encoding="utf-8")
+        try:
+            initial = json.loads(reader.readline() or "null")
+        except (OSError, ValueError):
+            initial = None
+        if not initial:
+            sock.close()
+            return
+
+        with self._lock:
+            client_id = initial.get("clientId") or ""
+            if client_id and client_id not in self._connections:
+                self._send(sock, {"tipo": client.MSG_ERROR, "clientId": client_id, "code": client.ERROR_UNKNOWN_CLIENT})
+                sock.close()
+                return
+            if not client_id:
+                client_id = f"Client-{self._next_id}"
+                self._next_id += 1
+                self._order.append(client_id)
+            # Igual que server.go: CONNECTED y después lo retenido durante la desconexión
+            self._send(sock, {"tipo": client.MSG_CONNECTED, "clientId": client_id})
+            for message in self._pending.pop(client_id, []):
+                self._send(sock, message)
+            self._connections[client_id] = sock
+
+        interval_ms = initial.get("heartbeatIntervalMs", 0)
+        if interval_ms > 0:
+            max_misses = initial.get("heartbeatMaxMisses", 0) or 3
+            sock.settimeout(max(interval_ms / 1000, self.MIN_HEARTBEAT_INTERVAL) * (max_misses + 1))
+
+        try:
+            for line in reader:
+                message = json.loads(line)
+                if message.get("type") == client.MSG_PING:
+                    self._send(sock, {"tipo": client.MSG_PONG, "clientId": client_id, "seq": message.get("seq"),
+                                      "timestamp": message.get("timestamp"), "serverTime": time.time_ns()})
+                elif message.get("type") == client.MSG_END_CONNECTION:
+                    with self._lock:
+                        self._connections.pop(client_id, None)
+                        self._pending.pop(client_id, None)
+                        self._order.remove(client_id)
+                    break
+        except (OSError, ValueError):
+            pass # Incluye el plazo de lectura vencido: la conexión se da por perdida
+        with self._lock:
+            if self._connections.get(client_id) is sock:
+                self._connections[client_id] = None
+        sock.close()
+
+    def _broadcast(self, message):
+        """Difunde con el lock tomado; los coches desconectados lo reciben al reconectar."""
+        if message["tipo"] == client.MSG_CAR_STATUS:
+            previous = self.positions.get(message["clientId"], (None, None))
+            self.positions[message["clientId"]] = (previous[1], message["position"])
+        for client_id, sock in self._connections.items():
+            if sock is None or not self._send(sock, message):
+                pending = self._pending.setdefault(client_id, [])
+                # Se fusionan los CAR_STATUS seguidos del mismo coche, como el emisor de server.go
+                if (pending and message["tipo"] == client.MSG_CAR_STATUS and pending[-1]["tipo"] == client.MSG_CAR_STATUS
+                        and pending[-1]["clientId"] == message["clientId"]):
+                    pending[-1] = message
+                else:
+                    pending.append(message)
+
+    def _status(self, client_id, position, state):
+        return {"tipo": client.MSG_CAR_STATUS, "clientId": client_id, "position": position,
+                "direction": client.DIRECTION_EAST_WEST, "isCrossing": state == client.CAR_STATE_CROSSING, "state": state}
+
+    def _bridge_loop(self):
+        position = 0
+        while self._running:
+            time.sleep(self.STEP)
+            with self._lock:
+                if self._crossing is None:
+                    # El siguiente coche conectado en orden; los desconectados no ocupan el puente
+                    ready = [client_id for client_id in self._order if self._connections.get(client_id)]
+                    if ready:
+                        self._crossing, position = ready[0], 0
+                        self._broadcast({"tipo": client.MSG_CAR_START, "clientId": self._crossing})
+                        self._broadcast(self._status(self._crossing, position, client.CAR_STATE_CROSSING))
+                    continue
+
+                crossing = self._crossing
+                if crossing not in self._order or not self._connections.get(crossing):
+                    # Perdió la conexión (o terminó) a mitad del cruce: se libera el puente
+                    self._broadcast({"tipo": client.MSG_CAR_END, "clientId": crossing})
+                elif position < client.LENGTH_BRIDGE:
+                    position = min(position + self.STEP_LENGTH, client.LENGTH_BRIDGE)
+                    self._broadcast(self._status(crossing, position, client.CAR_STATE_CROSSING))
+                    continue
+                else:
+                    self._broadcast(self._status(crossing, client.LENGTH_BRIDGE, client.CAR_STATE_COOLDOWN))
+                    self._broadcast({"tipo": client.MSG_CAR_END, "clientId": crossing})
+                if crossing in self._order:
+                    self._order.remove(crossing)
+                    self._order.append(crossing)
+                self._crossing = None
+
+
+def _reset_client_state():
+    if client.is_connected:
+        client.end_connection_action()
+    client.assigned_client_id = ""
+    client.reconnect_attempts = 0
+    client.reconnect_timer = 0
+    client.client_id_rejected = False
+    with client.car_status_lock:
+        client.all_cars_status.clear()
+
+
+def _own_position():
+    with client.car_status_lock:
+        car = client.all_cars_status.get(client.assigned_client_id)
+        return car["position"] if car else None
+
+
+def run_scenario(scenario, target, bridge_server=None):
+    """
+    Ejecuta un escenario y retorna un diccionario con los tiempos medidos (segundos)
+    y si se cumplieron las expectativas del escenario.
+    """
+    result = {"name": scenario.get("name", "?"), "disconnected": False, "detect_s": None,
+              "reconnect_s": None, "resync_s": None, "resync_ok": None, "failures": []}
+
+    with ImpairmentProxy(target) as proxy:
+        _reset_client_state()
+        client.HOST, client.PORT = "localhost", proxy.port
+        velocity_box = client.InputBox(0, 0, 10, 10, text="30", is_numeric=True)
+        cooldown_box = client.InputBox(0, 0, 10, 10, text="2", is_numeric=True)
+        direction = client.DIRECTION_EAST_WEST
+
+        if not client.attempt_connection(velocity_box, cooldown_box, direction):
+            result["failures"].append("no se pudo conectar")
+            return result
+
+        deadline = time.monotonic() + 3
+        while (not client.assigned_client_id or _own_position() is None) and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+        client_id = client.assigned_client_id
+
+        disruption_at = []
+        proxy.start_scenario(scenario, on_event=lambda event, at: event["action"] in DISRUPTIVE_ACTIONS and disruption_at.append(at))
+        last_event = max((event["at"] + event.get("duration", 0) for event in scenario.get("events", [])), default=0)
+        end = time.monotonic() + last_event + SETTLE_SECONDS
+
+        detected_at = reconnected_at = None
+        status_message = ""
+        last_tick = time.monotonic()
+        while time.monotonic() < end:
+            now = time.monotonic()
+            status_message = client.update_reconnection(now - last_tick, velocity_box, cooldown_box, direction, status_message)
+            last_tick = now
+
+            connected = client.is_connected and client.get_heartbeat_metrics().get("confirmed", False)
+            if detected_at is None and not client.is_connected:
+                detected_at = now
+                result["disconnected"] = True
+                if disruption_at:
+                    result["detect_s"] = detected_at - disruption_at[0]
+                with client.car_status_lock:
+                    # Solo cuenta el estado recibido tras la caída (puede llegar junto con el CONNECTED)
+                    client.all_cars_status.pop(client_id, None)
+            elif detected_at is not None and reconnected_at is None and connected:
+                reconnected_at = now
+                result["reconnect_s"] = reconnected_at - detected_at
+            elif reconnected_at is not None and result["resync_s"] is None:
+                position = _own_position()
+                in_sync = position is not None and (bridge_server is None or position in bridge_server.current_positions(client_id))
+                if in_sync and client.assigned_client_id == client_id:
+                    result["resync_s"] = now - reconnected_at
+            time.sleep(POLL_INTERVAL)
+
+        proxy.wait_scenario(timeout=1)
+        if reconnected_at is not None:
+            result["resync_ok"] = result["resync_s"] is not None and client.assigned_client_id == client_id
+        _reset_client_state()
+
+    expect = scenario.get("expect", {})
+    if "disconnect" in expect and expect["disconnect"] != result["disconnected"]:
+        result["failures"].append("desconexión inesperada" if result["disconnected"] else "no detectó la falla")
+    if expect.get("disconnect"):
+        for key, label in (("detect_s", "detección"), ("reconnect_s", "reconexión"), ("resync_s", "resincronización")):
+            limit = expect.get(f"max_{key}")
+            if limit is not None and (result[key] is None or result[key] > limit):
+                result["failures"].append(f"{label} > {limit}s")
+        if result["resync_ok"] is False:
+            result["failures"].append("estado no resincronizado")
+    return result
+
+
+def _format_seconds(value):
+    return f"{value:.3f}s" if value is not None else "-"
+
+
+def start_go_server(server_bin, verbose=False):
+    """Inicia el servidor sin clientes propios en un puerto libre. Retorna (proceso, puerto)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("localhost", 0))
+        port = probe.getsockname()[1]
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen([server_bin, "-puerto", str(port), "-clientes", "-1"], cwd=HERE, stdout=output, stderr=output)
+    if not wait_for_port(("localhost", port), SERVER_START_TIMEOUT):
+        process.kill()
+        raise RuntimeError(f"server.go no empezó a escuchar en el puerto {port}")
+    return process, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide la recuperación del cliente ante fallas de red simuladas.")
+    parser.add_argument("scenarios", nargs="?", default=DEFAULT_SCENARIOS, help="Archivo JSON con uno o más escenarios")
+    parser.add_argument("--only", action="append", help="Ejecutar solo los escenarios con este nombre")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--server", help="Servidor ya iniciado host:puerto (por defecto se inicia server.go)")
+    source.add_argument("--server-bin", help="Ejecutable de server.go ya compilado (por defecto se compila con go build)")
+    source.add_argument("--local", action="store_true", help="Usar LocalBridgeServer en lugar de server.go (sin Go instalado)")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida de client.py y del servidor")
+    args = parser.parse_args()
+
+    scenarios = load_scenario(args.scenarios)
+    scenarios = scenarios if isinstance(scenarios, list) else [scenarios]
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if scenario.get("name") in args.only]
+
+    bridge_server = server_process = None
+    if args.server:
+        host, port = args.server.rsplit(":", 1)
+        target = (host, int(port))
+    elif args.local:
+        bridge_server = LocalBridgeServer().start()
+        target = ("localhost", bridge_server.port)
+    else:
+        try:
+            server_bin = args.server_bin
+            if not server_bin:
+                # Se compila antes en lugar de "go run": terminar "go run" no detiene al servidor
+                build_dir = tempfile.mkdtemp(prefix="recovery_report_")
+                server_bin = os.path.join(build_dir, "server.exe" if os.name == "nt" else "server")
+                subprocess.run(["go", "build", "-o", server_bin, "server.go"], cwd=HERE, check=True)
+            server_process, port = start_go_server(server_bin, args.verbose)
+        except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+            parser.error(f"no se pudo iniciar server.go ({e}); use --server-bin, --server o --local")
+        target = ("localhost", port)
+
+    report = sys.stdout # Los hilos de client.py siguen imprimiendo después de cada escenario
+    print(f"{'escenario':>22} | {'desconexión':>11} | {'detección':>9} | {'reconexión':>10} | {'resinc.':>8} | resultado")
+    print("-" * 95)
+    failed = False
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+        for scenario in scenarios:
+            result = run_scenario(scenario, target, bridge_server)
+            failed = failed or bool(result["failures"])
+            print(f"{result['name']:>22} | {'sí' if result['disconnected'] else 'no':>11} | {_format_seconds(result['detect_s']):>9} | "
+                  f"{_format_seconds(result['reconnect_s']):>10} | {_format_seconds(result['resync_s']):>8} | "
+                  f"{'OK' if not result['failures'] else 'FALLA: ' + ', '.join(result['failures'])}", file=report, flush=True)
+
+    if bridge_server:
+        bridge_server.stop()
+    if server_process:
+        server_process.terminate()
+        server_process.wait(timeout=5)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Planificador del puente (implementación de referencia en Python).
+
+Reemplaza el bucle de desencolar/re-encolar de manejoDelPuente (server.go):
+- Una cola de listos por dirección (OrderedDict -> O(1) para encolar, sacar
+  el primero y eliminar por ClientID).
+- Un min-heap con los coches en cooldown, ordenado por el instante en que
+  vuelven a ser elegibles.
+- Un índice ClientID -> entrada para saber en qué estructura está cada coche.
+
+next_car() duerme hasta que haya un coche elegible (o hasta que venza el
+próximo cooldown) en lugar de girar sobre las colas.
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+# Deben coincidir con el Backend Go
+DIRECTION_NONE = "NONE"
+DIRECTION_EAST_WEST = "EAST_TO_WEST"
+DIRECTION_WEST_EAST = "WEST_TO_EAST"
+CAR_STATE_WAITING = "WAITING"
+CAR_STATE_COOLDOWN = "COOLDOWN"
+
+# Orden en que se revisan las colas cuando la dirección actual no tiene coches
+DIRECTION_ORDER = (DIRECTION_EAST_WEST, DIRECTION_WEST_EAST)
+
+
+def _normalize_direction(direction):
+    """Igual que conectarCliente: cualquier dirección que no sea ESTE A OESTE se trata como OESTE A ESTE."""
+    return direction if direction == DIRECTION_EAST_WEST else DIRECTION_WEST_EAST
+
+
+class _Entry:
+    __slots__ = ("client_id", "direction", "state", "ready_at", "seq")
+
+    def __init__(self, client_id, direction):
+        self.client_id = client_id
+        self.direction = direction
+        self.state = CAR_STATE_WAITING
+        self.ready_at = 0.0
+        self.seq = 0 # Identifica la entrada vigente del heap (borrado perezoso)
+
+
+class BridgeScheduler:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._ready = {direction: OrderedDict() for direction in DIRECTION_ORDER}
+        self._cooldown = [] # (ready_at, seq, client_id)
+        self._entries = {}
+        self._seq = 0
+
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+
+    def __contains__(self, client_id):
+        with self._cond:
+            return client_id in self._entries
+
+    def state_of(self, client_id):
+        with self._cond:
+            entry = self._entries.get(client_id)
+            return entry.state if entry else None
+
+    def add(self, client_id, direction):
+        """Encola un coche listo para cruzar en la dirección indicada."""
+        with self._cond:
+            self._discard(client_id)
+            entry = _Entry(client_id, _normalize_direction(direction))
+            self._entries[client_id] = entry
+            self._ready[entry.direction][client_id] = entry
+            self._cond.notify()
+
+    def cooldown(self, client_id, direction, seconds):
+        """Deja un coche en espera hasta que pasen 'seconds' y luego lo encola en 'direction'."""
+        with self._cond:
+            self._discard(client_id)
+            entry = _Entry(client_id, _normalize_direction(direction))
+            entry.state = CAR_STATE_COOLDOWN
+            entry.ready_at = self._clock() + max(0, seconds)
+            self._seq += 1
+            entry.seq = self._seq
+            self._entries[client_id] = entry
+            heapq.heappush(self._cooldown, (entry.ready_at, entry.seq, client_id))
+            self._cond.notify()
+
+    def remove(self, client_id):
+        """Elimina un coche del planificador. Retorna True si estaba presente."""
+        with self._cond:
+            removed = self._discard(client_id)
+            if removed:
+                self._cond.notify()
+            return removed
+
+    def next_car(self, current_direction=DIRECTION_NONE, timeout=None):
+        """
+        Retorna (client_id, direction) del próximo coche que debe cruzar,
+        priorizando la dirección actual. Bloquea hasta que haya uno elegible.
+        Retorna None si se agota 'timeout' (en segundos).
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._cond:
+            while True:
+                now = self._clock()
+                self._promote_expired(now)
+
+                choice = self._pop_ready(current_direction)
+                if choice is not None:
+                    return choice
+
+                wait = None
+                if self._cooldown:
+                    wait = max(0.0, self._cooldown[0][0] - now)
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def try_next_car(self, current_direction=DIRECTION_NONE):
+        """Versión no bloqueante de next_car()."""
+        with self._cond:
+            self._promote_expired(self._clock())
+            return self._pop_ready(current_direction)
+
+    def next_ready_in(self):
+        """Segundos hasta que el próximo coche en cooldown sea elegible (None si no hay)."""
+        with self._cond:
+            if not self._cooldown:
+                return None
+            return max(0.0, self._cooldown[0][0] - self._clock())
+
+    # --- Internos (se llaman con self._cond tomado) ---
+
+    def _discard(self, client_id):
+        entry = self._entries.pop(client_id, None)
+        if entry is None:
+            return False
+        if entry.state == CAR_STATE_WAITING:
+            del self._ready[entry.direction][client_id]
+        # Si estaba en cooldown, su tupla queda en el heap y se descarta
+        # cuando llegue a la cima (su seq ya no coincide con ninguna entrada).
+        return True
+
+    def _promote_expired(self, now):
+        while self._cooldown and self._cooldown[0][0] <= now:
+            _, seq, client_id = heapq.heappop(self._cooldown)
+            entry = self._entries.get(client_id)
+            if entry is None or entry.state != CAR_STATE_COOLDOWN or entry.seq != seq:
+                continue
+            entry.state = CAR_STATE_WAITING
+            self._ready[entry.direction][client_id] = entry
+
+    def _pop_ready(self, current_direction):
+        directions = DIRECTION_ORDER
+        if current_direction in self._ready:
+            directions = (current_direction,) + tuple(d for d in DIRECTION_ORDER if d != current_direction)
+        for direction in directions:
+            queue = self._ready[direction]
+            if queue:
+                client_id, _ = queue.popitem(last=False)
+                del self._entries[client_id]
+                return client_id, direction
+        return None
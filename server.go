@@ -1,12 +1,18 @@
 package main
 
 import (
+	"container/heap"
+	"container/list"
 	"encoding/json"
+	"flag"
 	"fmt"
 	"math/rand"
 	"net"
 	"os/exec"
+	"slices"
 	"strconv"
+	"sync"
+	"sync/atomic"
 	"time"
 )
 
@@ -22,6 +28,18 @@ const (
 
 	MSG_END_CONNECTION = "END_CONNECTION"
 
+	MSG_PING = "PING"
+	MSG_PONG = "PONG"
+
+	MSG_UPDATE_RATE = "UPDATE_RATE"
+
+	MSG_ERROR            = "ERROR"
+	ERROR_UNKNOWN_CLIENT = "UNKNOWN_CLIENT" // El ClientID de la reconexión no existe (expulsado o servidor reiniciado)
+
+	MSG_BRIDGE_INFO = "BRIDGE_INFO"
+
+	MSG_QUEUE_STATUS = "QUEUE_STATUS"
+
 	DIRECTION_NONE      = "NONE"
 	DIRECTION_EAST_WEST = "EAST_TO_WEST"
 	DIRECTION_WEST_EAST = "WEST_TO_EAST"
@@ -31,57 +49,556 @@ const (
 	SERVER_PORT         = 12345
 
 	TIEMPO_MAXIMO_DESCONEXION = 30 // En segundos
+
+	MIN_INTERVALO_LATIDO  = 50 * time.Millisecond // Cota inferior al intervalo de latido pedido por el cliente
+	INTERVALO_PASO_PUENTE = time.Second           // Tiempo entre cada avance del coche que cruza
+
+	TIEMPO_MAXIMO_ESCRITURA        = 5 * time.Second // Una escritura bloqueada más tiempo da la conexión por perdida
+	TIEMPO_MAXIMO_INICIALIZACION   = 2 * time.Second // Para recibir el mensaje inicial; las conexiones se aceptan de a una
+	INTERVALO_MAXIMO_CONTRAPRESION = time.Second     // Antigüedad máxima de un CAR_STATUS retenido por contrapresión
+
+	INTERVALO_INFO_PUENTE = time.Second // Cada cuánto se envía la carga del puente a los observadores
+
+	INTERVALO_PUBLICACION_COLAS = 200 * time.Millisecond // Separación mínima entre dos publicaciones de las colas
+	COLA_VISIBLE_MAXIMA         = 200                    // ClientIDs publicados por cola; del resto solo se envía el total
 )
 
-// Una cola genérica para enteros
-type CarQueue []*Car
+// Entrada del planificador para un coche
+type entradaPlanificador struct {
+	car         *Car
+	direccion   string
+	elemento    *list.Element // Posición en la cola de listos (nil si está en cooldown)
+	vencimiento time.Time     // Momento en que el coche vuelve a ser elegible
+	indiceHeap  int           // Posición en el heap de cooldown (-1 si está listo)
+}
+
+// Coche en cooldown copiado por Instantanea para ordenarlo sin retener el lock
+type enCooldown struct {
+	clientID    string
+	direccion   string
+	vencimiento time.Time
+}
+
+// Min-heap de coches en cooldown, ordenado por vencimiento
+type heapCooldown []*entradaPlanificador
+
+func (h heapCooldown) Len() int           { return len(h) }
+func (h heapCooldown) Less(i, j int) bool { return h[i].vencimiento.Before(h[j].vencimiento) }
+func (h heapCooldown) Swap(i, j int) {
+	h[i], h[j] = h[j], h[i]
+	h[i].indiceHeap = i
+	h[j].indiceHeap = j
+}
+
+func (h *heapCooldown) Push(x any) {
+	entrada := x.(*entradaPlanificador)
+	entrada.indiceHeap = len(*h)
+	*h = append(*h, entrada)
+}
+
+func (h *heapCooldown) Pop() any {
+	old := *h
+	n := len(old)
+	entrada := old[n-1]
+	old[n-1] = nil
+	entrada.indiceHeap = -1
+	*h = old[:n-1]
+	return entrada
+}
+
+// Planificador decide qué coche cruza el puente.
+// Mantiene una cola de listos por dirección, un min-heap con los coches en
+// cooldown y un índice ClientID -> entrada, de modo que encolar, sacar y
+// eliminar por ClientID no recorren las colas. Siguiente() duerme hasta que
+// haya un coche elegible en lugar de girar sobre los coches en cooldown.
+// La implementación de referencia en Python está en scheduler.py.
+type Planificador struct {
+	mu        sync.Mutex
+	listos    map[string]*list.List
+	cooldown  heapCooldown
+	indice    map[string]*entradaPlanificador
+	despertar chan struct{}
+	cambios   chan struct{} // Avisa a publicarColas que las colas cambiaron
+}
+
+func NuevoPlanificador() *Planificador {
+	return &Planificador{
+		listos: map[string]*list.List{
+			DIRECTION_EAST_WEST: list.New(),
+			DIRECTION_WEST_EAST: list.New(),
+		},
+		indice:    make(map[string]*entradaPlanificador),
+		despertar: make(chan struct{}, 1),
+		cambios:   make(chan struct{}, 1),
+	}
+}
+
+// Despierta a Siguiente() si está esperando
+func (p *Planificador) avisar() {
+	select {
+	case p.despertar <- struct{}{}:
+	default:
+	}
+	p.avisarCambio()
+}
+
+// Despierta a publicarColas
+func (p *Planificador) avisarCambio() {
+	select {
+	case p.cambios <- struct{}{}:
+	default:
+	}
+}
+
+// Encolar añade un coche listo para cruzar al final de la cola de su dirección
+func (p *Planificador) Encolar(car *Car) {
+	p.mu.Lock()
+	defer p.mu.Unlock()
+
+	p.descartar(car.ClientID)
+	car.State = CAR_STATE_WAITING
+	entrada := &entradaPlanificador{car: car, direccion: car.Direction, indiceHeap: -1}
+	entrada.elemento = p.listos[car.Direction].PushBack(entrada)
+	p.indice[car.ClientID] = entrada
+	p.avisar()
+}
+
+// EnCooldown deja al coche en espera durante 'duracion'; al vencer pasa a la cola de su dirección
+func (p *Planificador) EnCooldown(car *Car, duracion time.Duration) {
+	p.mu.Lock()
+	defer p.mu.Unlock()
+
+	p.descartar(car.ClientID)
+	car.State = CAR_STATE_COOLDOWN
+	entrada := &entradaPlanificador{car: car, direccion: car.Direction, vencimiento: time.Now().Add(duracion)}
+	heap.Push(&p.cooldown, entrada)
+	p.indice[car.ClientID] = entrada
+	p.avisar()
+}
+
+// Remover elimina un coche del planificador por su ClientID.
+// Retorna 'true' si el coche estaba en alguna cola.
+func (p *Planificador) Remover(clientID string) bool {
+	p.mu.Lock()
+	defer p.mu.Unlock()
+
+	if !p.descartar(clientID) {
+		return false
+	}
+
+	fmt.Printf("Coche %s removido de la cola.\n", clientID)
+	p.avisar()
+	return true
+}
+
+// Contiene indica si el coche está en alguna cola del planificador
+func (p *Planificador) Contiene(clientID string) bool {
+	p.mu.Lock()
+	defer p.mu.Unlock()
+	_, ok := p.indice[clientID]
+	return ok
+}
+
+// Size retorna el número de coches en el planificador (listos y en cooldown)
+func (p *Planificador) Size() int {
+	p.mu.Lock()
+	defer p.mu.Unlock()
+	return len(p.indice)
+}
+
+// Instantanea retorna la cabeza de cada cola (las de listos por orden de llegada y
+// las de cooldown por vencimiento) con su largo total, y el próximo vencimiento de
+// un cooldown (cero si no hay)
+func (p *Planificador) Instantanea() (colas []MensajeCola, proximoVencimiento time.Time) {
+	direcciones := []string{DIRECTION_EAST_WEST, DIRECTION_WEST_EAST}
+
+	p.mu.Lock()
+	p.promoverVencidos(time.Now())
+	for _, direccion := range direcciones {
+		cola := p.listos[direccion]
+		ids := make([]string, 0, min(cola.Len(), COLA_VISIBLE_MAXIMA))
+		for elemento := cola.Front(); elemento != nil && len(ids) < COLA_VISIBLE_MAXIMA; elemento = elemento.Next() {
+			ids = append(ids, elemento.Value.(*entradaPlanificador).car.ClientID)
+		}
+		colas = append(colas, MensajeCola{State: CAR_STATE_WAITING, Direction: direccion, IDs: ids, Total: cola.Len()})
+	}
+	enEspera := make([]enCooldown, len(p.cooldown))
+	for i, entrada := range p.cooldown {
+		enEspera[i] = enCooldown{entrada.car.ClientID, entrada.direccion, entrada.vencimiento}
+	}
+	p.mu.Unlock()
+
+	// El heap solo garantiza el primero: se ordena la copia fuera del lock
+	slices.SortFunc(enEspera, func(a, b enCooldown) int { return a.vencimiento.Compare(b.vencimiento) })
+	if len(enEspera) > 0 {
+		proximoVencimiento = enEspera[0].vencimiento
+	}
+	for _, direccion := range direcciones {
+		cola := MensajeCola{State: CAR_STATE_COOLDOWN, Direction: direccion, IDs: []string{}}
+		for _, coche := range enEspera {
+			if coche.direccion != direccion {
+				continue
+			}
+			if len(cola.IDs) < COLA_VISIBLE_MAXIMA {
+				cola.IDs = append(cola.IDs, coche.clientID)
+			}
+			cola.Total++
+		}
+		colas = append(colas, cola)
+	}
+	return colas, proximoVencimiento
+}
+
+// Siguiente retorna el próximo coche que debe cruzar, priorizando la dirección actual.
+// Bloquea hasta que haya un coche elegible.
+func (p *Planificador) Siguiente(direccionActual string) *Car {
+	for {
+		p.mu.Lock()
+		ahora := time.Now()
+		p.promoverVencidos(ahora)
+
+		if car := p.sacarListo(direccionActual); car != nil {
+			p.mu.Unlock()
+			return car
+		}
+
+		// Nadie elegible: dormir hasta el próximo vencimiento o hasta que cambien las colas
+		var timer *time.Timer
+		var temporizador <-chan time.Time
+		if p.cooldown.Len() > 0 {
+			timer = time.NewTimer(p.cooldown[0].vencimiento.Sub(ahora))
+			temporizador = timer.C
+		}
+		p.mu.Unlock()
+
+		select {
+		case <-p.despertar:
+		case <-temporizador:
+		}
+
+		if timer != nil {
+			timer.Stop()
+		}
+	}
+}
+
+// Los siguientes métodos se llaman con p.mu tomado
+
+func (p *Planificador) descartar(clientID string) bool {
+	entrada, ok := p.indice[clientID]
+	if !ok {
+		return false
+	}
+
+	if entrada.elemento != nil {
+		p.listos[entrada.direccion].Remove(entrada.elemento)
+	} else {
+		heap.Remove(&p.cooldown, entrada.indiceHeap)
+	}
+	delete(p.indice, clientID)
+	return true
+}
+
+func (p *Planificador) promoverVencidos(ahora time.Time) {
+	for p.cooldown.Len() > 0 && !p.cooldown[0].vencimiento.After(ahora) {
+		entrada := heap.Pop(&p.cooldown).(*entradaPlanificador)
+		entrada.car.State = CAR_STATE_WAITING
+		entrada.elemento = p.listos[entrada.direccion].PushBack(entrada)
+	}
+}
+
+func (p *Planificador) sacarListo(direccionActual string) *Car {
+	direcciones := []string{DIRECTION_EAST_WEST, DIRECTION_WEST_EAST}
+	if direccionActual == DIRECTION_WEST_EAST {
+		direcciones = []string{DIRECTION_WEST_EAST, DIRECTION_EAST_WEST}
+	}
+
+	for _, direccion := range direcciones {
+		cola := p.listos[direccion]
+		if cola.Len() > 0 {
+			entrada := cola.Remove(cola.Front()).(*entradaPlanificador)
+			delete(p.indice, entrada.car.ClientID)
+			p.avisarCambio()
+			return entrada.car
+		}
+	}
+	return nil
+}
+
+var planificador = NuevoPlanificador()
+
+// Mensaje pendiente de envío en un Emisor
+type envioPendiente struct {
+	estado  *MensajeCarStatus // CAR_STATUS, se puede fusionar con uno posterior del mismo coche
+	mensaje any               // Cualquier otro mensaje del puente
+}
+
+// Emisor envía a un cliente los mensajes del puente desde su propia goroutine.
+// Los CAR_STATUS de un mismo coche se fusionan (solo se envía el último) y se
+// envían como máximo a la frecuencia pedida por el cliente, o cada
+// INTERVALO_MAXIMO_CONTRAPRESION si el cliente indicó contrapresión. Un cliente
+// lento recibe menos actualizaciones, pero ninguna con más retraso que ese.
+type Emisor struct {
+	car           *Car
+	mu            sync.Mutex
+	cola          []envioPendiente
+	ultimoEstado  map[string]int // Posición en la cola del CAR_STATUS pendiente de cada coche
+	hayControl    bool           // La cola tiene mensajes que no se pueden retener (CAR_START, CAR_END)
+	colas         *MensajeColas  // Última instantánea de las colas pendiente de envío
+	versionColas  uint64         // Versión de la última instantánea aceptada
+	intervalo     time.Duration  // Separación mínima entre envíos (0 = sin límite)
+	contrapresion bool
+	ultimoEnvio   time.Time
+	senal         chan struct{}
+	fin           chan struct{}
+	cierre        sync.Once
+}
+
+func NuevoEmisor(car *Car) *Emisor {
+	return &Emisor{
+		car:          car,
+		ultimoEstado: make(map[string]int),
+		senal:        make(chan struct{}, 1),
+		fin:          make(chan struct{}),
+	}
+}
+
+func (e *Emisor) avisar() {
+	select {
+	case e.senal <- struct{}{}:
+	default:
+	}
+}
+
+// Configurar aplica la frecuencia máxima (en actualizaciones por segundo, 0 = sin límite)
+// y el estado de contrapresión pedidos por el cliente
+func (e *Emisor) Configurar(maxUpdateRate float64, contrapresion bool) {
+	e.mu.Lock()
+	if maxUpdateRate > 0 {
+		e.intervalo = time.Duration(float64(time.Second) / maxUpdateRate)
+	} else {
+		e.intervalo = 0
+	}
+	e.contrapresion = contrapresion
+	e.mu.Unlock()
+	e.avisar()
+}
+
+// EnviarEstado encola un CAR_STATUS, reemplazando al pendiente del mismo coche si lo hay
+func (e *Emisor) EnviarEstado(estado MensajeCarStatus) {
+	e.mu.Lock()
+	if i, ok := e.ultimoEstado[estado.ClientID]; ok {
+		estado.Conflated = e.cola[i].estado.Conflated + 1
+		e.cola[i].estado = &estado
+	} else {
+		e.ultimoEstado[estado.ClientID] = len(e.cola)
+		e.cola = append(e.cola, envioPendiente{estado: &estado})
+	}
+	e.mu.Unlock()
+	e.avisar()
+}
+
+// EnviarColas deja pendiente una instantánea de las colas, reemplazando a la anterior.
+// Se descarta si ya se aceptó una más nueva; la misma versión se acepta de nuevo
+// para reenviarla a una conexión que se acaba de registrar.
+func (e *Emisor) EnviarColas(colas MensajeColas) {
+	e.mu.Lock()
+	if colas.version < e.versionColas {
+		e.mu.Unlock()
+		return
+	}
+	e.versionColas = colas.version
+	e.colas = &colas
+	e.mu.Unlock()
+	e.avisar()
+}
+
+// Enviar encola un mensaje que se envía en orden y sin límite de frecuencia
+func (e *Emisor) Enviar(mensaje any) {
+	e.mu.Lock()
+	e.cola = append(e.cola, envioPendiente{mensaje: mensaje})
+	e.hayControl = true
+	// Los CAR_STATUS posteriores no pueden fusionarse con los anteriores a este mensaje
+	clear(e.ultimoEstado)
+	e.mu.Unlock()
+	e.avisar()
+}
+
+// reencolar devuelve al frente de la cola los mensajes que no se pudieron enviar
+func (e *Emisor) reencolar(pendientes []envioPendiente) {
+	e.mu.Lock()
+	e.cola = append(pendientes, e.cola...)
+	// Los índices cambiaron: los CAR_STATUS nuevos se agregan al final en lugar de fusionarse
+	clear(e.ultimoEstado)
+	e.hayControl = true
+	e.mu.Unlock()
+}
+
+// Cerrar detiene la goroutine del emisor
+func (e *Emisor) Cerrar() {
+	e.cierre.Do(func() { close(e.fin) })
+}
+
+func (e *Emisor) separacion() time.Duration {
+	if e.contrapresion {
+		return max(e.intervalo, INTERVALO_MAXIMO_CONTRAPRESION)
+	}
+	return e.intervalo
+}
+
+func (e *Emisor) ejecutar() {
+	var temporizador <-chan time.Time
+
+	for {
+		select {
+		case <-e.senal:
+		case <-temporizador:
+		case <-e.fin:
+			return
+		}
+		temporizador = nil
 
-// Enqueue añade un elemento al final de la cola
-func (q *CarQueue) Enqueue(item *Car) {
-	*q = append(*q, item)
+		e.mu.Lock()
+		// Sin conexión se retiene la cola (los CAR_STATUS se siguen fusionando) y se
+		// envía al reconectar, para que el cliente no se pierda CAR_START ni CAR_END
+		if (len(e.cola) == 0 && e.colas == nil) || e.car.conectionLost.Load() {
+			e.mu.Unlock()
+			continue
+		}
+		if !e.hayControl {
+			if espera := time.Until(e.ultimoEnvio.Add(e.separacion())); espera > 0 {
+				e.mu.Unlock()
+				temporizador = time.After(espera)
+				continue
+			}
+		}
+		cola := e.cola
+		if e.colas != nil {
+			// Después de los CAR_STATUS y de cualquier otro mensaje; si el envío falla se reencola como uno más
+			cola = append(cola, envioPendiente{mensaje: *e.colas})
+			e.colas = nil
+		}
+		e.cola = nil
+		clear(e.ultimoEstado)
+		e.hayControl = false
+		e.ultimoEnvio = time.Now()
+		e.mu.Unlock()
+
+		e.car.muEnvio.Lock()
+		conn := e.car.conn
+		traza := e.car.traza
+		e.car.muEnvio.Unlock()
+
+		for i, pendiente := range cola {
+			mensaje := pendiente.mensaje
+			if pendiente.estado != nil {
+				estado := *pendiente.estado
+				if traza {
+					estado.Trace = &TrazaEstado{Tick: estado.tick, Send: time.Now().UnixNano()}
+				}
+				mensaje = estado
+			}
+
+			if err := enviar(e.car, mensaje); err != nil {
+				println("Error al enviar mensaje del puente al cliente", e.car.ClientID, ":", err)
+				e.reencolar(cola[i:])
+				perderConexion(e.car, conn)
+				break
+			}
+		}
+	}
 }
 
-// Dequeue remueve y retorna el primer elemento de la cola.
-// Retorna un error si la cola está vacía.
-func (q *CarQueue) Dequeue() (*Car, error) {
-	if q.IsEmpty() {
-		return nil, fmt.Errorf("la cola está vacía")
+// Envía un mensaje del puente a todos los clientes a través de sus emisores
+func difundir(mensaje any) {
+	if estado, ok := mensaje.(MensajeCarStatus); ok {
+		estado.tick = time.Now().UnixNano()
+		mensaje = estado
+	}
+
+	for _, car := range destinosDifusion() {
+		if estado, ok := mensaje.(MensajeCarStatus); ok {
+			car.emisor.EnviarEstado(estado)
+		} else {
+			car.emisor.Enviar(mensaje)
+		}
 	}
-	item := (*q)[0]
-	*q = (*q)[1:] // Remueve el primer elemento
-	return item, nil
 }
 
-// IsEmpty verifica si la cola está vacía
-func (q *CarQueue) IsEmpty() bool {
-	return len(*q) == 0
+// Última instantánea de las colas publicada, para las conexiones que se registran después
+var muColas sync.Mutex
+var colasPublicadas = MensajeColas{Tipo: MSG_QUEUE_STATUS, Queues: []MensajeCola{}}
+
+func ultimasColas() MensajeColas {
+	muColas.Lock()
+	defer muColas.Unlock()
+	return colasPublicadas
 }
 
-// Size retorna el número de elementos en la cola
-func (q *CarQueue) Size() int {
-	return len(*q)
+// Envía la última instantánea de las colas a una conexión recién registrada
+// (llamar después de agregarla a su tabla: las siguientes le llegan con difundir)
+func enviarColas(car *Car) {
+	car.emisor.EnviarColas(ultimasColas())
 }
 
-// RemoveCarByID busca y elimina un coche de la cola por su ClientID.
-// Retorna el coche removido y 'true' si se encontró y eliminó,
-// o 'nil' y 'false' si el coche no se encontró en la cola.
-func (q *CarQueue) RemoveCarByID(clientID string) (*Car, bool) {
-	for i, car := range *q {
-		if car.ClientID == clientID {
-			// Coche encontrado. Lo eliminamos del slice.
-			removedCar := car
-			*q = append((*q)[:i], (*q)[i+1:]...) // Elimina el elemento en el índice 'i'
+// Publica las colas del planificador como un QUEUE_STATUS con la cabeza de cada
+// cola y su total, para que los clientes dibujen quién espera y en qué orden. Se
+// difunde solo si las colas cambiaron y como mucho cada INTERVALO_PUBLICACION_COLAS;
+// el tamaño del mensaje no depende del número de coches. El emisor de cada conexión
+// envía solo la última instantánea pendiente.
+func publicarColas() {
+	for {
+		colas, proximoVencimiento := planificador.Instantanea()
 
-			fmt.Printf("Coche %s removido de la cola.\n", clientID)
-			return removedCar, true
+		muColas.Lock()
+		cambiaron := !slices.EqualFunc(colas, colasPublicadas.Queues, MensajeCola.igual)
+		if cambiaron {
+			colasPublicadas = MensajeColas{Tipo: MSG_QUEUE_STATUS, Queues: colas, version: colasPublicadas.version + 1}
+		}
+		publicacion := colasPublicadas
+		muColas.Unlock()
+
+		if cambiaron {
+			for _, car := range destinosDifusion() {
+				car.emisor.EnviarColas(publicacion)
+			}
+			time.Sleep(INTERVALO_PUBLICACION_COLAS)
+		}
+
+		// Esperar un cambio en las colas o que venza un cooldown (el coche pasa a esperar)
+		var vencimiento <-chan time.Time
+		var timer *time.Timer
+		if !proximoVencimiento.IsZero() {
+			timer = time.NewTimer(time.Until(proximoVencimiento))
+			vencimiento = timer.C
+		}
+		select {
+		case <-planificador.cambios:
+		case <-vencimiento:
+		}
+		if timer != nil {
+			timer.Stop()
 		}
 	}
+}
 
-	return nil, false // Coche no encontrado
+// Envía periódicamente la carga del puente a los observadores (vista combinada y
+// clientes que eligen el puente menos cargado)
+func informarCarga() {
+	for range time.Tick(INTERVALO_INFO_PUENTE) {
+		info := infoPuente()
+		for _, observador := range observadores() {
+			observador.emisor.Enviar(info)
+		}
+	}
 }
 
-var EastToWestQueue CarQueue
-var WestToEastQueue CarQueue
+func infoPuente() MensajeInfoPuente {
+	muTablas.Lock()
+	coches := len(tablaClientes)
+	muTablas.Unlock()
+	return MensajeInfoPuente{Tipo: MSG_BRIDGE_INFO, Cars: coches, Waiting: planificador.Size(), Direction: direccionPublicada.Load().(string)}
+}
 
 // Estructuras de mensajes enviados desde el servidor al cliente y viceversa
 
@@ -90,29 +607,89 @@ type MensajeStatusToClient struct {
 	ClientID string `json:"clientId"`
 }
 
+type MensajeError struct {
+	Tipo     string `json:"tipo"`
+	ClientID string `json:"clientId"`
+	Code     string `json:"code"`
+}
+
+type MensajeInfoPuente struct {
+	Tipo      string `json:"tipo"`
+	Cars      int    `json:"cars"`      // Coches registrados en este puente
+	Waiting   int    `json:"waiting"`   // Coches en el planificador (esperando o en cooldown)
+	Direction string `json:"direction"` // Dirección actual del puente
+}
+
+// Una cola del puente (estado y dirección) tal como la publica publicarColas
+type MensajeCola struct {
+	State     string   `json:"state"` // WAITING o COOLDOWN
+	Direction string   `json:"direction"`
+	IDs       []string `json:"ids"`   // Los primeros COLA_VISIBLE_MAXIMA coches, empezando por la cabeza
+	Total     int      `json:"total"` // Coches en la cola, incluidos los que no están en IDs
+}
+
+func (c MensajeCola) igual(otra MensajeCola) bool {
+	return c.State == otra.State && c.Direction == otra.Direction && c.Total == otra.Total && slices.Equal(c.IDs, otra.IDs)
+}
+
+type MensajeColas struct {
+	Tipo    string        `json:"tipo"`
+	Queues  []MensajeCola `json:"queues"`
+	version uint64        // Orden de publicación, para que el emisor no envíe una instantánea vieja después de una nueva
+}
+
 type MensajeChangeCarProperties struct {
 	Velocity       int `json:"velocity"`
 	TiempoDeEspera int `json:"tiempoDeEspera"`
 }
 
 type MensajeCarStatus struct {
-	ClientID   string `json:"clientId"`
-	Position   int    `json:"position"`
-	Direction  string `json:"direction"`
-	IsCrossing bool   `json:"isCrossing"`
-	State      string `json:"state"` // WAITING, CROSSING
+	ClientID   string       `json:"clientId"`
+	Position   int          `json:"position"`
+	Direction  string       `json:"direction"`
+	IsCrossing bool         `json:"isCrossing"`
+	State      string       `json:"state"` // WAITING, CROSSING, COOLDOWN
+	Tipo       string       `json:"tipo"`
+	Conflated  int          `json:"conflated,omitempty"` // Actualizaciones de este coche reemplazadas por esta antes de enviarse
+	Trace      *TrazaEstado `json:"trace,omitempty"`     // Solo para clientes que pidieron trazas
+	tick       int64        // Momento en que el puente generó la actualización (nanosegundos Unix)
+}
+
+// Marcas de tiempo del servidor para medir la latencia hasta el cliente (nanosegundos Unix)
+type TrazaEstado struct {
+	Tick int64 `json:"tick"` // El puente generó la actualización
+	Send int64 `json:"send"` // El emisor la escribió en el socket
+}
+
+type MensajePong struct {
 	Tipo       string `json:"tipo"`
+	ClientID   string `json:"clientId"`
+	Seq        int    `json:"seq"`
+	Timestamp  int64  `json:"timestamp"`  // Eco del timestamp del PING (reloj del cliente)
+	ServerTime int64  `json:"serverTime"` // Hora del servidor en nanosegundos Unix
 }
 
 type MessageToServer struct {
-	Tipo string `json:"type"`
+	Tipo           string  `json:"type"`
+	Velocity       int     `json:"velocity"`       // CHANGE_CAR_PROPERTIES
+	TiempoDeEspera int     `json:"tiempoDeEspera"` // CHANGE_CAR_PROPERTIES
+	Seq            int     `json:"seq"`            // PING
+	Timestamp      int64   `json:"timestamp"`      // PING
+	MaxUpdateRate  float64 `json:"maxUpdateRate"`  // UPDATE_RATE
+	Backpressure   bool    `json:"backpressure"`   // UPDATE_RATE
 }
 
 type InicializacionCliente struct {
-	Direction      string `json:"direction"`
-	Velocity       int    `json:"velocity"`
-	TiempoDeEspera int    `json:"tiempoDeEspera"`
-	ClientID       string `json:"clientId"`
+	Direction           string  `json:"direction"`
+	Velocity            int     `json:"velocity"`
+	TiempoDeEspera      int     `json:"tiempoDeEspera"`
+	ClientID            string  `json:"clientId"`
+	HeartbeatIntervalMs int     `json:"heartbeatIntervalMs"` // 0 si el cliente no envía latidos
+	HeartbeatMaxMisses  int     `json:"heartbeatMaxMisses"`
+	MaxUpdateRate       float64 `json:"maxUpdateRate"` // Actualizaciones por segundo que acepta el cliente (0 = sin límite)
+	Backpressure        bool    `json:"backpressure"`
+	Trace               bool    `json:"trace"`   // Incluir marcas de tiempo en los CAR_STATUS
+	Observe             bool    `json:"observe"` // Conexión de solo lectura: recibe las difusiones pero no entra al puente
 }
 
 type MensajeInicializacionToClient struct {
@@ -135,54 +712,159 @@ type Car struct {
 	Velocity              int
 	TiempoDeEspera        int
 	conn                  net.Conn
-	lastTimeConectionLost time.Time
-	conectionLost         bool
+	lastTimeConectionLost time.Time     // Protegido por muEnvio
+	conectionLost         atomic.Bool   // Lo escribe la goroutine de la conexión y lo lee la del puente
+	perdida               chan struct{} // Se cierra al perder la conexión; uno nuevo por conexión (protegido por muEnvio)
+	cruzando              bool          // El puente lo tomó y todavía no lo liberó (protegido por muEnvio)
+	muEnvio               sync.Mutex    // Serializa las escrituras al cliente desde distintas goroutines
+	plazoLatido           time.Duration // Tiempo máximo sin recibir nada del cliente (0 = sin latidos)
+	emisor                *Emisor       // Envía los mensajes del puente respetando la frecuencia del cliente
+	traza                 bool          // El cliente pidió marcas de tiempo en los CAR_STATUS
+	observador            bool          // Conexión de solo lectura, guardada en tablaObservadores
 }
 
 // Tabla de clientes conectados al servidor
 var tablaClientes = make(map[string]*Car)
 var client_id_counter = 0
 
+// Observadores: conexiones de solo lectura de la vista combinada de varios puentes
+var tablaObservadores = make(map[string]*Car)
+var observer_id_counter = 0
+
+// Protege tablaClientes y tablaObservadores: las escriben la goroutine que acepta
+// conexiones y las de cada conexión, y las recorren el puente, publicarColas e
+// informarCarga
+var muTablas sync.Mutex
+
+func observadores() []*Car {
+	muTablas.Lock()
+	defer muTablas.Unlock()
+	lista := make([]*Car, 0, len(tablaObservadores))
+	for _, observador := range tablaObservadores {
+		lista = append(lista, observador)
+	}
+	return lista
+}
+
+// Coches y observadores que reciben las difusiones del puente
+func destinosDifusion() []*Car {
+	muTablas.Lock()
+	defer muTablas.Unlock()
+	lista := make([]*Car, 0, len(tablaClientes)+len(tablaObservadores))
+	for _, car := range tablaClientes {
+		lista = append(lista, car)
+	}
+	for _, observador := range tablaObservadores {
+		lista = append(lista, observador)
+	}
+	return lista
+}
+
+// Retorna el coche registrado con ese ClientID, o nil
+func buscarCliente(clientID string) *Car {
+	muTablas.Lock()
+	defer muTablas.Unlock()
+	return tablaClientes[clientID]
+}
+
+// El puente es el único que lee y escribe current_car, is_occupied y current_direction
 var current_car *Car
 var is_occupied bool
 var current_direction string
 
+// Copia de current_direction para informarCarga, que corre en otra goroutine
+var direccionPublicada atomic.Value
+
+// Cambia la dirección del puente (solo desde manejoDelPuente o antes de iniciarlo)
+func fijarDireccion(direccion string) {
+	current_direction = direccion
+	direccionPublicada.Store(direccion)
+}
+
 // Termina la conexión del cliente
 func terminarConexion(car *Car) {
 	fmt.Printf("El cliente %s ha finalizado la conexión.\n", car.ClientID)
 	car.conn.Close()
-	EastToWestQueue.RemoveCarByID(car.ClientID)
-	WestToEastQueue.RemoveCarByID(car.ClientID)
+	car.emisor.Cerrar()
+	if car.observador {
+		muTablas.Lock()
+		delete(tablaObservadores, car.ClientID)
+		muTablas.Unlock()
+		return
+	}
+	planificador.Remover(car.ClientID)
+	muTablas.Lock()
 	delete(tablaClientes, car.ClientID)
+	muTablas.Unlock()
+}
+
+// Envía un mensaje al cliente. El puente y la goroutine de cada conexión escriben
+// en el mismo socket, por lo que las escrituras se serializan por coche.
+func enviar(car *Car, mensaje any) error {
+	car.muEnvio.Lock()
+	defer car.muEnvio.Unlock()
+	car.conn.SetWriteDeadline(time.Now().Add(TIEMPO_MAXIMO_ESCRITURA))
+	return car.enc.Encode(mensaje)
+}
+
+// Calcula el plazo sin latidos tras el cual se da por perdida la conexión
+func calcularPlazoLatido(intervaloMs int, maxPerdidos int) time.Duration {
+	if intervaloMs <= 0 {
+		return 0
+	}
+	if maxPerdidos <= 0 {
+		maxPerdidos = 3
+	}
+	intervalo := max(time.Duration(intervaloMs)*time.Millisecond, MIN_INTERVALO_LATIDO)
+	// Un latido extra de margen para absorber el jitter
+	return intervalo * time.Duration(maxPerdidos+1)
 }
 
 // Maneja la conexión del cliente con el servidor
 func handleConnection(car *Car) {
-	enc := car.enc
+	car.muEnvio.Lock()
+	conn := car.conn
 	dec := car.dec
+	plazoLatido := car.plazoLatido
+	car.muEnvio.Unlock()
 
 	for {
+		if plazoLatido > 0 {
+			conn.SetReadDeadline(time.Now().Add(plazoLatido))
+		}
 
 		var mensaje MessageToServer
 		err := dec.Decode(&mensaje)
 		if err != nil {
-			println("Error decodificando mensaje:", err)
+			if netErr, ok := err.(net.Error); ok && netErr.Timeout() {
+				fmt.Printf("El cliente %s no envió latidos en %s.\n", car.ClientID, plazoLatido)
+			} else {
+				println("Error decodificando mensaje:", err)
+			}
+			perderConexion(car, conn)
 			break
 		}
 
-		if mensaje.Tipo == MSG_CHANGE_CAR_PROPERTIES {
-			var mensajeChangeCarProperties MensajeChangeCarProperties
-			err := dec.Decode(&mensajeChangeCarProperties)
+		if mensaje.Tipo == MSG_PING {
+			err = enviar(car, MensajePong{Tipo: MSG_PONG, ClientID: car.ClientID, Seq: mensaje.Seq, Timestamp: mensaje.Timestamp, ServerTime: time.Now().UnixNano()})
 			if err != nil {
-				println("Error decodificando mensaje de cambio de propiedades:", err)
-				break
+				println("Error al enviar PONG al cliente", car.ClientID, ":", err)
 			}
+			continue
+		}
 
-			car.Velocity = mensajeChangeCarProperties.Velocity
-			car.TiempoDeEspera = mensajeChangeCarProperties.TiempoDeEspera
+		if mensaje.Tipo == MSG_UPDATE_RATE {
+			car.emisor.Configurar(mensaje.MaxUpdateRate, mensaje.Backpressure)
+			fmt.Printf("Frecuencia de actualización del cliente %s: %.1f/s, contrapresión=%t\n", car.ClientID, mensaje.MaxUpdateRate, mensaje.Backpressure)
+			continue
+		}
+
+		if mensaje.Tipo == MSG_CHANGE_CAR_PROPERTIES {
+			car.Velocity = mensaje.Velocity
+			car.TiempoDeEspera = mensaje.TiempoDeEspera
 			fmt.Printf("Cambio de propiedades del auto %s: Velocidad=%d, Tiempo de espera=%d\n", car.ClientID, car.Velocity, car.TiempoDeEspera)
 
-			err = enc.Encode(MensajeStatusToClient{Tipo: MSG_CHANGE_CAR_PROPERTIES_ACK, ClientID: car.ClientID})
+			err = enviar(car, MensajeStatusToClient{Tipo: MSG_CHANGE_CAR_PROPERTIES_ACK, ClientID: car.ClientID})
 			if err != nil {
 				println("Error al enviar mensaje de estado del car:", err)
 			}
@@ -204,10 +886,17 @@ func conectarCliente(conn net.Conn) (*Car, error) {
 
 	inicializacionCliente := InicializacionCliente{}
 
+	// Una conexión medio abierta no puede bloquear a los clientes que se conecten después
+	conn.SetReadDeadline(time.Now().Add(TIEMPO_MAXIMO_INICIALIZACION))
 	err := dec.Decode(&inicializacionCliente)
 	if err != nil {
 		return nil, fmt.Errorf("Error decodificando mensaje de inicialización del cliente: %s", err)
 	}
+	conn.SetReadDeadline(time.Time{})
+
+	if inicializacionCliente.Observe {
+		return conectarObservador(conn, enc, dec)
+	}
 
 	var client_id string
 
@@ -230,23 +919,31 @@ func conectarCliente(conn net.Conn) (*Car, error) {
 			TiempoDeEspera:        inicializacionCliente.TiempoDeEspera,
 			conn:                  conn,
 			lastTimeConectionLost: time.Time{},
-			conectionLost:         false,
+			perdida:               make(chan struct{}),
+			plazoLatido:           calcularPlazoLatido(inicializacionCliente.HeartbeatIntervalMs, inicializacionCliente.HeartbeatMaxMisses),
+			traza:                 inicializacionCliente.Trace,
 		}
 
+		car.emisor = NuevoEmisor(car)
+		car.emisor.Configurar(inicializacionCliente.MaxUpdateRate, inicializacionCliente.Backpressure)
+		go car.emisor.ejecutar()
+
+		muTablas.Lock()
 		tablaClientes[client_id] = car
+		muTablas.Unlock()
 
-		err = enc.Encode(MensajeStatusToClient{Tipo: MSG_CONNECTED, ClientID: client_id})
+		err = enviar(car, MensajeStatusToClient{Tipo: MSG_CONNECTED, ClientID: client_id})
 		if err != nil {
 			println("Error al enviar mensaje de conexión:", err)
 			conn.Close()
 			return nil, err
 		}
 
-		if inicializacionCliente.Direction == DIRECTION_EAST_WEST {
-			EastToWestQueue.Enqueue(car)
-		} else {
-			WestToEastQueue.Enqueue(car)
+		if car.Direction != DIRECTION_EAST_WEST {
+			car.Direction = DIRECTION_WEST_EAST
 		}
+		planificador.Encolar(car)
+		enviarColas(car)
 		client_id_counter++
 
 		return car, nil
@@ -255,182 +952,202 @@ func conectarCliente(conn net.Conn) (*Car, error) {
 		client_id := inicializacionCliente.ClientID
 		println("Cliente reconectado:", client_id)
 
-		car, ok := tablaClientes[client_id]
-		if !ok {
+		car := buscarCliente(client_id)
+		if car == nil {
+			// Avisar al cliente para que no siga reintentando con un ID que ya no existe
+			enc.Encode(MensajeError{Tipo: MSG_ERROR, ClientID: client_id, Code: ERROR_UNKNOWN_CLIENT})
 			return nil, fmt.Errorf("No se encuentra el cliente %s", client_id)
 		}
 
+		car.muEnvio.Lock()
 		car.enc = enc
 		car.dec = dec
 		car.conn = conn
-		car.lastTimeConectionLost = time.Time{}
-		car.conectionLost = false
+		car.plazoLatido = calcularPlazoLatido(inicializacionCliente.HeartbeatIntervalMs, inicializacionCliente.HeartbeatMaxMisses)
+		car.traza = inicializacionCliente.Trace
+		car.muEnvio.Unlock()
 
-		err = enc.Encode(MensajeStatusToClient{Tipo: MSG_CONNECTED, ClientID: client_id})
+		// CONNECTED va antes que lo que el emisor retuvo durante la desconexión
+		err = enviar(car, MensajeStatusToClient{Tipo: MSG_CONNECTED, ClientID: client_id})
 		if err != nil {
 			println("Error al enviar mensaje de conexión:", err)
 			conn.Close()
 			return nil, err
 		}
 
+		car.muEnvio.Lock()
+		marcarConexionConCliente(car)
+		cruzando := car.cruzando
+		car.muEnvio.Unlock()
+		car.emisor.Configurar(inicializacionCliente.MaxUpdateRate, inicializacionCliente.Backpressure) // Despierta al emisor
+		// La última instantánea que recibió pudo perderse con la conexión anterior
+		enviarColas(car)
+
+		// Si se sacó de las colas al perder la conexión, vuelve a esperar su turno. Si el
+		// puente todavía lo tiene, lo devuelve a la cola el puente al liberarlo
+		if !cruzando && !planificador.Contiene(client_id) {
+			planificador.Encolar(car)
+		}
+
 		return car, nil
 	}
 
 }
 
-// Marca la conexión con el cliente como conectado
-func marcarConexionConCliente(car *Car) {
-	car.conectionLost = false
-	car.lastTimeConectionLost = time.Time{}
+// Registra una conexión de solo lectura. Recibe las mismas difusiones que los coches
+// y la carga del puente, pero nunca entra al planificador
+func conectarObservador(conn net.Conn, enc *json.Encoder, dec *json.Decoder) (*Car, error) {
+	muTablas.Lock()
+	observador := &Car{
+		ClientID:   "Observer-" + strconv.Itoa(observer_id_counter),
+		dec:        dec,
+		enc:        enc,
+		conn:       conn,
+		observador: true,
+	}
+	observer_id_counter++
+	muTablas.Unlock()
+
+	if err := enviar(observador, MensajeStatusToClient{Tipo: MSG_CONNECTED, ClientID: observador.ClientID}); err != nil {
+		conn.Close()
+		return nil, err
+	}
+	if err := enviar(observador, infoPuente()); err != nil {
+		conn.Close()
+		return nil, err
+	}
+
+	observador.emisor = NuevoEmisor(observador)
+	go observador.emisor.ejecutar()
+
+	muTablas.Lock()
+	tablaObservadores[observador.ClientID] = observador
+	muTablas.Unlock()
+	enviarColas(observador)
+	println("Nuevo observador conectado:", observador.ClientID)
+
+	return observador, nil
 }
 
-// Si el tiempo de desconexión excede 30 segundos, desconectar el cliente y devolvera false
-func comprobarTiempoDeDesconexion(car *Car) bool {
-	if !car.conectionLost {
-		car.conectionLost = true
-		car.lastTimeConectionLost = time.Now()
-	} else {
-		if time.Since(current_car.lastTimeConectionLost) > time.Second*TIEMPO_MAXIMO_DESCONEXION {
-			println("El cliente", current_car.ClientID, "ha sido desconectado por exceso de tiempo.")
+// Marca la conexión como perdida: el coche sale del planificador para no bloquear
+// el puente y se elimina si no se reconecta antes de TIEMPO_MAXIMO_DESCONEXION
+func perderConexion(car *Car, conn net.Conn) {
+	if car.observador {
+		// Un observador no se reconecta con el mismo ID: se elimina directamente
+		muTablas.Lock()
+		_, activo := tablaObservadores[car.ClientID]
+		muTablas.Unlock()
+		if activo {
 			terminarConexion(car)
-			return false
 		}
+		return
+	}
+	car.muEnvio.Lock()
+	if car.conn != conn || car.conectionLost.Load() || buscarCliente(car.ClientID) != car {
+		car.muEnvio.Unlock()
+		return // Ya se detectó la pérdida, el cliente se reconectó con otra conexión o terminó la conexión
+	}
+
+	conn.Close()
+	car.conectionLost.Store(true)
+	car.lastTimeConectionLost = time.Now()
+	perdidaEn := car.lastTimeConectionLost
+	close(car.perdida) // Despierta a esperarPaso si el coche está cruzando
+	car.muEnvio.Unlock()
+
+	planificador.Remover(car.ClientID)
+
+	time.AfterFunc(time.Second*TIEMPO_MAXIMO_DESCONEXION, func() {
+		car.muEnvio.Lock()
+		sigueSinConexion := car.conectionLost.Load() && car.lastTimeConectionLost.Equal(perdidaEn)
+		car.muEnvio.Unlock()
+		if sigueSinConexion && buscarCliente(car.ClientID) == car {
+			println("El cliente", car.ClientID, "ha sido desconectado por exceso de tiempo.")
+			terminarConexion(car)
+		}
+	})
+}
+
+// Espera un paso del cruce. Retorna false si el coche que cruza perdió la conexión
+func esperarPaso(car *Car) bool {
+	car.muEnvio.Lock()
+	perdida := car.perdida
+	car.muEnvio.Unlock()
+
+	temporizador := time.NewTimer(INTERVALO_PASO_PUENTE)
+	defer temporizador.Stop()
+	select {
+	case <-perdida:
+		return false
+	case <-temporizador.C:
+		return !car.conectionLost.Load()
+	}
+}
+
+// Marca la conexión con el cliente como conectado (llamar con car.muEnvio tomado)
+func marcarConexionConCliente(car *Car) {
+	if car.conectionLost.Load() {
+		car.perdida = make(chan struct{}) // El anterior ya está cerrado
 	}
+	car.conectionLost.Store(false)
+	car.lastTimeConectionLost = time.Time{}
+}
 
+// El puente toma al coche que le dio el planificador. Retorna false si perdió la
+// conexión; en ese caso la reconexión lo devuelve a la cola
+func tomarPuente(car *Car) bool {
+	car.muEnvio.Lock()
+	defer car.muEnvio.Unlock()
+	if car.conectionLost.Load() {
+		return false
+	}
+	car.cruzando = true
 	return true
 }
 
+// El puente libera al coche. Retorna true si sigue registrado y conectado: una
+// reconexión mientras el puente lo tenía no lo encoló (ver conectarCliente)
+func liberarPuente(car *Car) bool {
+	car.muEnvio.Lock()
+	defer car.muEnvio.Unlock()
+	car.cruzando = false
+	return !car.conectionLost.Load() && buscarCliente(car.ClientID) == car
+}
+
 func manejoDelPuente() {
 	for {
-		// Solo si no hay un coche cruzando
+		// Solo si no hay un coche cruzando. Siguiente() duerme hasta que haya un coche elegible
 		if current_car == nil {
-			var nextCar *Car
-
-			// Prioridad 1: Coches en dirección actual si no hay ninguno
-			if current_direction == DIRECTION_EAST_WEST && !EastToWestQueue.IsEmpty() {
-				// Buscar un coche que no esté en cooldown
-				for EastToWestQueue.Size() > 0 {
-					tempCar, _ := EastToWestQueue.Dequeue()
-					if tempCar.State == CAR_STATE_COOLDOWN {
-						EastToWestQueue.Enqueue(tempCar) // Re-encolar si está en cooldown
-					} else {
-						nextCar = tempCar
-						break
-					}
-				}
-			} else if current_direction == DIRECTION_WEST_EAST && !WestToEastQueue.IsEmpty() {
-				// Buscar un coche que no esté en cooldown
-				for WestToEastQueue.Size() > 0 {
-					tempCar, _ := WestToEastQueue.Dequeue()
-					if tempCar.State == CAR_STATE_COOLDOWN {
-						WestToEastQueue.Enqueue(tempCar) // Re-encolar si está en cooldown
-					} else {
-						nextCar = tempCar
-						break
-					}
-				}
-			}
-
-			// Si no hay coches en la dirección actual o ya se procesaron los cooldowns,
-			// intenta la dirección opuesta o la primera disponible
-			if nextCar == nil {
-				if !EastToWestQueue.IsEmpty() {
-					for EastToWestQueue.Size() > 0 {
-						tempCar, _ := EastToWestQueue.Dequeue()
-						if tempCar.State == CAR_STATE_COOLDOWN {
-							EastToWestQueue.Enqueue(tempCar)
-						} else {
-							nextCar = tempCar
-							current_direction = DIRECTION_EAST_WEST // Cambiar la dirección del puente
-							break
-						}
-					}
-				}
-				if nextCar == nil && !WestToEastQueue.IsEmpty() {
-					for WestToEastQueue.Size() > 0 {
-						tempCar, _ := WestToEastQueue.Dequeue()
-						if tempCar.State == CAR_STATE_COOLDOWN {
-							WestToEastQueue.Enqueue(tempCar)
-						} else {
-							nextCar = tempCar
-							current_direction = DIRECTION_WEST_EAST // Cambiar la dirección del puente
-							break
-						}
-					}
-				}
-			}
+			current_car = planificador.Siguiente(current_direction)
+		}
 
-			current_car = nextCar // Asignar el coche seleccionado
-			if current_car == nil {
-				time.Sleep(time.Second * 1) // Esperar si no hay coches en ninguna cola
-				continue
-			}
+		// Un coche sin conexión no ocupa el puente; vuelve a la cola cuando se reconecte.
+		// Los clientes lo sacan de su vista con el CAR_END
+		if !tomarPuente(current_car) {
+			difundir(MensajeStatusToClient{Tipo: MSG_CAR_END, ClientID: current_car.ClientID})
+			current_car = nil
+			continue
 		}
 
 		// Cambiar los estados del auto
 		current_car.State = CAR_STATE_CROSSING
 		current_car.IsCrossing = true
-		current_direction = current_car.Direction // Actualizar la dirección del puente
+		fijarDireccion(current_car.Direction) // Actualizar la dirección del puente
 
 		is_occupied = true
 
 		fmt.Printf("Puente ocupado por %s, en la dirección %s, a %d unidades por segundo\n", current_car.ClientID, current_direction, current_car.Velocity)
 
-		seDesconectoElClientePrincipal := false
-
 		// Enviar estado a todos los clientes
-		for _, car := range tablaClientes {
-			enc := car.enc
-			err := enc.Encode(MensajeStatusToClient{Tipo: MSG_CAR_START, ClientID: current_car.ClientID})
-			if err != nil {
-				println("Error al enviar mensaje de estado al cliente ", car.ClientID, ":", err)
-
-				res := comprobarTiempoDeDesconexion(car)
-
-				if !res && car.ClientID == current_car.ClientID {
-					seDesconectoElClientePrincipal = true
-				}
-			} else {
-				marcarConexionConCliente(car)
-			}
-		}
-
-		if seDesconectoElClientePrincipal {
-			current_car = nil
-			is_occupied = false
-			continue
-		}
-
-		// Enviar estado a todos los clientes
-		for _, car := range tablaClientes {
-			enc := car.enc
-			err := enc.Encode(MensajeCarStatus{Tipo: "CAR_STATUS", ClientID: current_car.ClientID, Position: 0, Direction: current_car.Direction, IsCrossing: true, State: CAR_STATE_CROSSING})
-			if err != nil {
-				println("Error al enviar mensaje de estado del auto al cliente ", car.ClientID, ":", err)
-
-				res := comprobarTiempoDeDesconexion(car)
-
-				if !res && car.ClientID == current_car.ClientID {
-					seDesconectoElClientePrincipal = true
-				}
-			} else {
-				marcarConexionConCliente(car)
-			}
-		}
-
-		if seDesconectoElClientePrincipal {
-			current_car = nil
-			is_occupied = false
-			continue
-		}
-
-		time.Sleep(time.Second * 1)
+		difundir(MensajeStatusToClient{Tipo: MSG_CAR_START, ClientID: current_car.ClientID})
+		difundir(MensajeCarStatus{Tipo: MSG_CAR_STATUS, ClientID: current_car.ClientID, Position: 0, Direction: current_car.Direction, IsCrossing: true, State: CAR_STATE_CROSSING})
 
 		conexionCerradaForzosamente := false
+		sinLatidos := !esperarPaso(current_car)
 
-		for current_car.Position < LENGTH_BRIDGE {
+		for !sinLatidos && current_car.Position < LENGTH_BRIDGE {
 
-			if tablaClientes[current_car.ClientID] == nil {
+			if buscarCliente(current_car.ClientID) == nil {
 				println("No se encuentra el cliente", current_car.ClientID)
 				conexionCerradaForzosamente = true
 				break
@@ -440,31 +1157,26 @@ func manejoDelPuente() {
 
 			current_car.Position = x
 
-			for _, car := range tablaClientes {
-				enc := car.enc
-				err := enc.Encode(MensajeCarStatus{Tipo: "CAR_STATUS", ClientID: current_car.ClientID, Position: x, Direction: current_car.Direction, IsCrossing: true, State: CAR_STATE_CROSSING})
-				if err != nil {
-					println("Error al enviar mensaje de estado del auto al cliente ", car.ClientID, ":", err)
+			difundir(MensajeCarStatus{Tipo: MSG_CAR_STATUS, ClientID: current_car.ClientID, Position: x, Direction: current_car.Direction, IsCrossing: true, State: CAR_STATE_CROSSING})
 
-					res := comprobarTiempoDeDesconexion(car)
+			fmt.Printf("Car %s crossing at %d\n", current_car.ClientID, current_car.Position)
+			sinLatidos = !esperarPaso(current_car)
+		}
 
-					if !res && car.ClientID == current_car.ClientID {
-						seDesconectoElClientePrincipal = true
-					}
-				} else {
-					marcarConexionConCliente(car)
-				}
-			}
+		if sinLatidos {
+			// El coche perdió la conexión a mitad del cruce: liberar el puente sin esperar TIEMPO_MAXIMO_DESCONEXION
+			fmt.Printf("El coche %s perdió la conexión mientras cruzaba, liberando el puente.\n", current_car.ClientID)
+			current_car.Position = 0
+			current_car.State = CAR_STATE_WAITING
+			current_car.IsCrossing = false
 
-			if seDesconectoElClientePrincipal {
-				break
-			}
+			difundir(MensajeStatusToClient{Tipo: MSG_CAR_END, ClientID: current_car.ClientID})
 
-			fmt.Printf("Car %s crossing at %d\n", current_car.ClientID, current_car.Position)
-			time.Sleep(time.Second * 1)
-		}
+			// Si ya se reconectó, vuelve a esperar su turno
+			if liberarPuente(current_car) {
+				planificador.Encolar(current_car)
+			}
 
-		if seDesconectoElClientePrincipal {
 			current_car = nil
 			is_occupied = false
 			continue
@@ -473,69 +1185,35 @@ func manejoDelPuente() {
 		if conexionCerradaForzosamente {
 			println("Conexión cerrada forzosamente por el cliente", current_car.ClientID)
 			println("Car eliminada de la cola")
+			// Terminó la sesión a mitad del cruce: sin el CAR_END quedaría en el puente de los demás clientes
+			difundir(MensajeStatusToClient{Tipo: MSG_CAR_END, ClientID: current_car.ClientID})
+			liberarPuente(current_car)
 			current_car = nil
 			is_occupied = false
-			current_direction = DIRECTION_NONE
+			fijarDireccion(DIRECTION_NONE)
 			continue
 		}
 
-		for _, car := range tablaClientes {
-			enc := car.enc
-			err := enc.Encode(MensajeCarStatus{Tipo: "CAR_STATUS", ClientID: current_car.ClientID, Position: LENGTH_BRIDGE, Direction: current_direction, IsCrossing: false, State: CAR_STATE_COOLDOWN})
-			if err != nil {
-				println("Error al enviar mensaje de estado del auto al cliente (2)", car.ClientID, ":", err)
-
-				res := comprobarTiempoDeDesconexion(car)
-
-				if !res && car.ClientID == current_car.ClientID {
-					seDesconectoElClientePrincipal = true
-				}
-			} else {
-				marcarConexionConCliente(car)
-			}
-		}
-
-		if seDesconectoElClientePrincipal {
-			current_car = nil
-			is_occupied = false
-			continue
-		}
+		difundir(MensajeCarStatus{Tipo: MSG_CAR_STATUS, ClientID: current_car.ClientID, Position: LENGTH_BRIDGE, Direction: current_direction, IsCrossing: false, State: CAR_STATE_COOLDOWN})
 
 		// Cambiar los estados del auto
 		current_car.Position = 0
 		current_car.State = CAR_STATE_COOLDOWN
 		current_car.IsCrossing = false
 
-		for _, car := range tablaClientes {
-			enc := car.enc
-			err := enc.Encode(MensajeStatusToClient{Tipo: MSG_CAR_END, ClientID: current_car.ClientID})
-			if err != nil {
-				println("Error al enviar mensaje de finalizar estado de carro al cliente (2)", car.ClientID, ":", err)
-
-				res := comprobarTiempoDeDesconexion(car)
-
-				if !res && car.ClientID == current_car.ClientID {
-					seDesconectoElClientePrincipal = true
-				}
-			} else {
-				marcarConexionConCliente(car)
-			}
-		}
+		difundir(MensajeStatusToClient{Tipo: MSG_CAR_END, ClientID: current_car.ClientID})
 
 		if current_car.Direction == DIRECTION_EAST_WEST {
 			current_car.Direction = DIRECTION_WEST_EAST
-			current_direction = DIRECTION_WEST_EAST
-			WestToEastQueue.Enqueue(current_car)
+			fijarDireccion(DIRECTION_WEST_EAST)
 		} else {
 			current_car.Direction = DIRECTION_EAST_WEST
-			current_direction = DIRECTION_EAST_WEST
-			EastToWestQueue.Enqueue(current_car)
+			fijarDireccion(DIRECTION_EAST_WEST)
 		}
 
-		carInCooldown := current_car
-		time.AfterFunc(time.Second*time.Duration(carInCooldown.TiempoDeEspera), func() {
-			carInCooldown.State = CAR_STATE_WAITING
-		})
+		// El planificador lo devuelve a la cola de su nueva dirección cuando termine el cooldown
+		planificador.EnCooldown(current_car, time.Second*time.Duration(current_car.TiempoDeEspera))
+		liberarPuente(current_car)
 		fmt.Printf("El car %s ha sido cambiado de dirección y ahora mismo esta en espera\n", current_car.ClientID)
 
 		is_occupied = false
@@ -544,12 +1222,17 @@ func manejoDelPuente() {
 }
 
 func main() {
+	// Varios servidores en la misma máquina (un puente por shard) necesitan puertos distintos
+	puerto := flag.Int("puerto", SERVER_PORT, "Puerto TCP del puente")
+	minClientes := flag.Int("clientes", 2, "Mínimo de clientes aleatorios a generar (negativo = ninguno)")
+	flag.Parse()
+
 	current_car = nil
-	current_direction = DIRECTION_NONE
+	fijarDireccion(DIRECTION_NONE)
 	is_occupied = false
 
 	// Inicia el servidor
-	server, err := net.Listen("tcp", ":"+strconv.Itoa(SERVER_PORT))
+	server, err := net.Listen("tcp", ":"+strconv.Itoa(*puerto))
 	if err != nil {
 		panic(err)
 	}
@@ -559,7 +1242,11 @@ func main() {
 	println("Iniciando el manejo del puente...")
 	// Comienza el manejo del puente
 	go manejoDelPuente()
-	go crearClientesAleatorios(2)
+	go informarCarga()
+	go publicarColas()
+	if *minClientes >= 0 {
+		go crearClientesAleatorios(*minClientes, *puerto)
+	}
 
 	println("Iniciando la conexión con los clientes...")
 	for {
@@ -580,8 +1267,8 @@ func main() {
 	}
 }
 
-// Crea minNumClientes a (minNumClientes + 10) clientes aleatorios
-func crearClientesAleatorios(minNumClientes int) {
+// Crea minNumClientes a (minNumClientes + 10) clientes aleatorios conectados al puente de este servidor
+func crearClientesAleatorios(minNumClientes int, puerto int) {
 	rand.Seed(time.Now().UnixNano())
 
 	// Se generara entre min a (min + 10) clientes de forma aleatoria
@@ -610,9 +1297,10 @@ func crearClientesAleatorios(minNumClientes int) {
 			dir = DIRECTION_WEST_EAST
 		}
 
-		println("python client.py " + strconv.Itoa(velocidadInicial) + " " + strconv.Itoa(tiempoDeEsperaInicial) + " " + dir)
+		puente := "localhost:" + strconv.Itoa(puerto)
+		println("python client.py " + strconv.Itoa(velocidadInicial) + " " + strconv.Itoa(tiempoDeEsperaInicial) + " " + dir + " --bridges " + puente)
 
-		cmd = exec.Command("python", "client.py", strconv.Itoa(velocidadInicial), strconv.Itoa(tiempoDeEsperaInicial), dir)
+		cmd = exec.Command("python", "client.py", strconv.Itoa(velocidadInicial), strconv.Itoa(tiempoDeEsperaInicial), dir, "--bridges", puente)
 		err := cmd.Start()
 		if err != nil {
 			println("Error al iniciar cliente:", err)
@@ -0,0 +1,279 @@
+"""
+Reparto de coches entre varios puentes (un servidor por shard).
+
+- HashRing: hashing consistente con nodos virtuales. Cada cliente se coloca en
+  el puente que sigue a su clave en el anillo; si ese puente cae, sus coches se
+  reparten entre los sucesores sin mover a los de los demás puentes.
+- probe_bridge_load / order_by_load: colocación en el puente menos cargado,
+  usando la carga que el servidor informa con BRIDGE_INFO.
+- LoadMonitor: sondea esas cargas en su propio hilo, para ordenar los puentes
+  sin bloquear a quien consulta (el bucle de Pygame de client.py).
+- ShardObserver: conexión de solo lectura ("observe": true) que mantiene la
+  tabla de coches de un puente para la vista combinada de client.py.
+
+Los puentes se escriben como "host:puerto" separados por comas.
+"""
+import bisect
+import hashlib
+import json
+import socket
+import threading
+import time
+
+# Deben coincidir con client.py y server.go
+MSG_CAR_STATUS = "CAR_STATUS"
+MSG_CAR_END = "CAR_END"
+MSG_QUEUE_STATUS = "QUEUE_STATUS"
+MSG_BRIDGE_INFO = "BRIDGE_INFO"
+MSG_END_CONNECTION = "END_CONNECTION"
+
+VIRTUAL_NODES = 64 # Puntos de cada puente en el anillo: reparto más parejo con pocos puentes
+PROBE_TIMEOUT = 0.5 # Segundos para conectar y recibir el BRIDGE_INFO de un puente
+OBSERVER_RETRY_DELAY = 1.0 # Segundos entre intentos de reconexión de un observador
+OBSERVER_SILENCE_TIMEOUT = 3.0 # Sin BRIDGE_INFO durante este tiempo, el puente se da por caído
+LOAD_PROBE_INTERVAL = 2.0 # Segundos entre dos sondeos de LoadMonitor
+
+
+def parse_endpoints(text):
+    """Convierte "host:puerto,host:puerto" en una lista de tuplas (host, puerto)."""
+    endpoints = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Puente inválido '{item}': se esperaba host:puerto")
+        endpoints.append((host, int(port)))
+    if not endpoints:
+        raise ValueError("No se indicó ningún puente")
+    return endpoints
+
+
+def format_endpoint(endpoint):
+    return f"{endpoint[0]}:{endpoint[1]}"
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, endpoints, virtual_nodes=VIRTUAL_NODES):
+        self.endpoints = list(endpoints)
+        self._ring = sorted(
+            (_hash(f"{format_endpoint(endpoint)}#{replica}"), endpoint)
+            for endpoint in self.endpoints
+            for replica in range(virtual_nodes)
+        )
+        self._keys = [point for point, _ in self._ring]
+
+    def successors(self, key):
+        """Puentes en el orden del anillo a partir de la clave: el primero es el asignado."""
+        if not self._ring:
+            return []
+        start = bisect.bisect(self._keys, _hash(key))
+        ordered = []
+        for offset in range(len(self._ring)):
+            endpoint = self._ring[(start + offset) % len(self._ring)][1]
+            if endpoint not in ordered:
+                ordered.append(endpoint)
+                if len(ordered) == len(self.endpoints):
+                    break
+        return ordered
+
+    def lookup(self, key):
+        successors = self.successors(key)
+        return successors[0] if successors else None
+
+
+def _observe(endpoint, timeout):
+    """Abre una conexión de observación y retorna (socket, archivo de lectura por líneas)."""
+    sock = socket.create_connection(endpoint, timeout=timeout)
+    sock.sendall(json.dumps({"observe": True}).encode("utf-8") + b"\n")
+    return sock, sock.makefile("r", encoding="utf-8")
+
+
+def probe_bridge_load(endpoint, timeout=PROBE_TIMEOUT):
+    """Retorna los coches registrados en el puente, o None si no responde."""
+    try:
+        sock, reader = _observe(endpoint, timeout)
+    except OSError:
+        return None
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            line = reader.readline()
+            if not line:
+                return None
+            message = json.loads(line)
+            if message.get("tipo") == MSG_BRIDGE_INFO:
+                return message.get("cars", 0)
+        return None
+    except (OSError, ValueError):
+        return None
+    finally:
+        try:
+            sock.sendall(json.dumps({"type": MSG_END_CONNECTION}).encode("utf-8") + b"\n")
+        except OSError:
+            pass
+        sock.close()
+
+
+def probe_loads(endpoints, timeout=PROBE_TIMEOUT):
+    """Sondea los puentes en paralelo. Retorna {puente: coches registrados, o None si no responde}."""
+    loads = {}
+
+    def probe(endpoint):
+        loads[endpoint] = probe_bridge_load(endpoint, timeout)
+
+    threads = [threading.Thread(target=probe, args=(endpoint,), daemon=True) for endpoint in endpoints]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout + 0.5)
+    return {endpoint: loads.get(endpoint) for endpoint in endpoints}
+
+
+def order_by_load(endpoints, timeout=PROBE_TIMEOUT):
+    """
+    Puentes que responden, del menos al más cargado. Los empates conservan el
+    orden recibido (por ejemplo, el del anillo). Bloquea mientras se sondean.
+    """
+    loads = probe_loads(endpoints, timeout)
+    alive = [endpoint for endpoint in endpoints if loads[endpoint] is not None]
+    return sorted(alive, key=lambda endpoint: loads[endpoint])
+
+
+class LoadMonitor:
+    """
+    Última carga conocida de cada puente, sondeada cada LOAD_PROBE_INTERVAL en un
+    hilo propio. order() no bloquea: ordena con lo que se sabe y pide un sondeo
+    nuevo para la próxima consulta.
+    """
+
+    def __init__(self, endpoints, interval=LOAD_PROBE_INTERVAL):
+        self.endpoints = list(endpoints)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.loads = {} # Puente -> coches del último sondeo (None si no respondió)
+        self._probed = threading.Event() # Terminó el primer sondeo
+        self._refresh = threading.Event()
+        self._running = False
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._refresh.set()
+
+    def wait_first_probe(self, timeout=PROBE_TIMEOUT + 0.5):
+        """Espera el primer sondeo (para elegir bien el primer puente). Retorna False si no terminó a tiempo."""
+        return self._probed.wait(timeout)
+
+    def order(self, endpoints):
+        """
+        Puentes del menos al más cargado según el último sondeo; después los que
+        todavía no se sondearon y al final los que no respondieron. Los empates
+        conservan el orden recibido.
+        """
+        with self.lock:
+            loads = dict(self.loads)
+        self._refresh.set()
+
+        def rank(endpoint):
+            if endpoint not in loads:
+                return (1, 0)
+            load = loads[endpoint]
+            return (0, load) if load is not None else (2, 0)
+
+        return sorted(endpoints, key=rank)
+
+    def _run(self):
+        while self._running:
+            loads = probe_loads(self.endpoints)
+            with self.lock:
+                self.loads = loads
+            self._probed.set()
+            self._refresh.wait(self.interval)
+            self._refresh.clear()
+
+
+class ShardObserver:
+    """
+    Mantiene la tabla de coches y las colas de un puente (mismo formato que
+    all_cars_status y queue_snapshot de client.py) y su última carga informada,
+    reconectándose si el puente cae.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.lock = threading.Lock()
+        self.cars_status = {}
+        self.queues = {}
+        self.info = {}
+        self.connected = False
+        self._running = False
+        self._sock = None
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        sock = self._sock
+        if sock:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def snapshot(self):
+        """Copia de (tabla de coches, colas, carga, conectado) para dibujar sin retener el lock."""
+        with self.lock:
+            return dict(self.cars_status), dict(self.queues), dict(self.info), self.connected
+
+    def _run(self):
+        while self._running:
+            try:
+                self._sock, reader = _observe(self.endpoint, OBSERVER_SILENCE_TIMEOUT)
+                with self.lock:
+                    self.connected = True
+                for line in reader:
+                    self._apply(json.loads(line))
+            except (OSError, ValueError):
+                pass
+            with self.lock:
+                self.connected = False
+                self.cars_status.clear()
+                self.queues.clear()
+                self.info.clear()
+            if self._sock:
+                self._sock.close()
+                self._sock = None
+            if self._running:
+                time.sleep(OBSERVER_RETRY_DELAY)
+
+    def _apply(self, message):
+        msg_type = message.get("tipo")
+        with self.lock:
+            if msg_type == MSG_CAR_STATUS and message.get("clientId"):
+                self.cars_status[message["clientId"]] = {
+                    "clientId": message["clientId"],
+                    "position": message.get("position", 0),
+                    "direction": message.get("direction", "NONE"),
+                    "isCrossing": message.get("isCrossing", False),
+                    "state": message.get("state", "NONE"),
+                }
+            elif msg_type == MSG_QUEUE_STATUS:
+                self.queues = {(queue.get("state"), queue.get("direction")): (queue.get("ids") or [], queue.get("total", 0))
+                               for queue in message.get("queues") or []}
+            elif msg_type == MSG_CAR_END:
+                self.cars_status.pop(message.get("clientId"), None)
+            elif msg_type == MSG_BRIDGE_INFO:
+                self.info = {key: value for key, value in message.items() if key != "tipo"}
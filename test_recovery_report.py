@@ -0,0 +1,40 @@
+"""
+Pruebas de recuperación de client.py con los escenarios de impairment_scenarios.json,
+contra LocalBridgeServer (no necesitan Go). Cada escenario debe cumplir su bloque
+"expect", igual que en python recovery_report.py --local.
+
+Uso: python -m pytest -q test_recovery_report.py
+"""
+import contextlib
+import io
+
+import pytest
+
+from impairment_proxy import load_scenario
+# recovery_report define el driver "dummy" de SDL antes de importar client.py
+from recovery_report import DEFAULT_SCENARIOS, LocalBridgeServer, run_scenario
+
+SCENARIOS = {scenario["name"]: scenario for scenario in load_scenario(DEFAULT_SCENARIOS)}
+
+
+@pytest.fixture(scope="module")
+def bridge_server():
+    server = LocalBridgeServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize("name", ["reset", "stall_2s"])
+def test_scenario_meets_expectations(bridge_server, name):
+    scenario = SCENARIOS[name]
+    with contextlib.redirect_stdout(io.StringIO()): # client.py informa cada paso de la reconexión
+        result = run_scenario(scenario, ("localhost", bridge_server.port), bridge_server)
+
+    expect = scenario["expect"]
+    assert result["disconnected"] == expect["disconnect"]
+    for key in ("detect_s", "reconnect_s", "resync_s"):
+        limit = expect.get(f"max_{key}")
+        if limit is not None:
+            assert result[key] is not None and result[key] <= limit, f"{key} = {result[key]} > {limit}"
+    assert result["resync_ok"] is True
+    assert result["failures"] == []
@@ -0,0 +1,198 @@
+"""
+Trazas de latencia "tick del servidor -> pixel".
+
+Cada CAR_STATUS trazado lleva los instantes en que el servidor generó la
+actualización ("tick") y la escribió en el socket ("send"). El cliente agrega
+sus propias marcas (recv, decode, lock, apply, frame, flip) y LatencyTracer
+calcula la latencia de cada etapa:
+
+    servidor       tick   -> send    cola del emisor (frecuencia/contrapresión)
+    red            send   -> recv    TCP y espera del recv
+    decodificacion recv   -> decode  json.loads (y mensajes anteriores del mismo recv)
+    lock           decode -> lock    espera de car_status_lock
+    aplicar        lock   -> apply   actualización de all_cars_status
+    espera_frame   apply  -> frame   hasta que el bucle de Pygame toma el estado
+    dibujo         frame  -> flip    dibujo del frame hasta pygame.display.flip()
+
+Todas las marcas están en nanosegundos de reloj de pared (time.time_ns()); las
+del servidor se corrigen con el desfase de reloj estimado con los PING/PONG.
+Las trazas se pueden exportar en formato Chrome trace-event (chrome://tracing,
+Perfetto).
+"""
+import json
+import threading
+
+STAGES = [
+    ("servidor", "tick", "send"),
+    ("red", "send", "recv"),
+    ("decodificacion", "recv", "decode"),
+    ("lock", "decode", "lock"),
+    ("aplicar", "lock", "apply"),
+    ("espera_frame", "apply", "frame"),
+    ("dibujo", "frame", "flip"),
+]
+TOTAL_STAGE = "total"
+
+# Procesos e hilos con los que se agrupan las etapas en la vista de Chrome
+_TRACE_THREADS = {
+    "servidor": (1, 1),
+    "red": (2, 1),
+    "decodificacion": (3, 1),
+    "lock": (3, 1),
+    "aplicar": (3, 1),
+    "espera_frame": (3, 2),
+    "dibujo": (3, 2),
+}
+_TRACE_NAMES = {
+    (1, None): "Servidor",
+    (2, None): "Red",
+    (3, None): "Cliente",
+    (1, 1): "Emisor",
+    (2, 1): "TCP",
+    (3, 1): "network_listener",
+    (3, 2): "run_game",
+}
+
+
+class LatencyHistogram:
+    """Histograma con cubetas en potencias de 2 de microsegundos."""
+
+    BUCKETS = 28 # 1 us .. ~134 s
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total_us = 0.0
+        self.min_us = None
+        self.max_us = None
+
+    def add(self, latency_us):
+        latency_us = max(0.0, latency_us)
+        bucket = min(self.BUCKETS - 1, int(latency_us).bit_length())
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total_us += latency_us
+        self.min_us = latency_us if self.min_us is None else min(self.min_us, latency_us)
+        self.max_us = latency_us if self.max_us is None else max(self.max_us, latency_us)
+
+    def percentile(self, fraction):
+        """Cota superior (en us) de la cubeta que contiene el percentil pedido."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(float(1 << bucket), self.max_us)
+        return self.max_us
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "avg_ms": self.total_us / self.count / 1000,
+            "min_ms": self.min_us / 1000,
+            "p50_ms": self.percentile(0.50) / 1000,
+            "p90_ms": self.percentile(0.90) / 1000,
+            "p99_ms": self.percentile(0.99) / 1000,
+            "max_ms": self.max_us / 1000,
+        }
+
+
+class LatencyTracer:
+    def __init__(self, max_traces=20000):
+        self.enabled = False
+        self.max_traces = max_traces # Trazas completas guardadas para exportar
+        self.clock_offset_ns = 0 # Reloj del servidor - reloj del cliente
+        self.superseded = 0 # Actualizaciones reemplazadas por otra del mismo coche antes de dibujarse
+        self._lock = threading.Lock()
+        self._pending = {} # carId -> traza aún no dibujada
+        self._traces = []
+        self._histograms = {stage: LatencyHistogram() for stage, _, _ in STAGES}
+        self._histograms[TOTAL_STAGE] = LatencyHistogram()
+
+    def record_update(self, car_id, server_trace, recv_ns, decode_ns, lock_ns, apply_ns):
+        """Registra un CAR_STATUS aplicado; queda pendiente hasta el próximo frame."""
+        if not self.enabled or not server_trace:
+            return
+        trace = {
+            "carId": car_id,
+            "tick": server_trace.get("tick", 0) - self.clock_offset_ns,
+            "send": server_trace.get("send", 0) - self.clock_offset_ns,
+            "recv": recv_ns,
+            "decode": decode_ns,
+            "lock": lock_ns,
+            "apply": apply_ns,
+        }
+        with self._lock:
+            if car_id in self._pending:
+                self.superseded += 1 # Solo la última actualización del coche llega a la pantalla
+            self._pending[car_id] = trace
+
+    def take_pending(self, frame_ns):
+        """Toma las actualizaciones que va a dibujar este frame (llamar con car_status_lock tomado)."""
+        with self._lock:
+            traces = list(self._pending.values())
+            self._pending.clear()
+        for trace in traces:
+            trace["frame"] = frame_ns
+        return traces
+
+    def complete(self, traces, flip_ns):
+        """Cierra las trazas del frame tras pygame.display.flip() y las agrega a los histogramas."""
+        if not traces:
+            return
+        with self._lock:
+            for trace in traces:
+                trace["flip"] = flip_ns
+                for stage, start, end in STAGES:
+                    self._histograms[stage].add((trace[end] - trace[start]) / 1000)
+                self._histograms[TOTAL_STAGE].add((trace["flip"] - trace["tick"]) / 1000)
+                if len(self._traces) < self.max_traces:
+                    self._traces.append(trace)
+
+    def summary(self):
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in self._histograms.items()}
+
+    def format_summary(self):
+        lines = [f"{'etapa':>15} | {'n':>6} | {'media':>8} | {'p50':>8} | {'p90':>8} | {'p99':>8} | {'max':>8}  (ms)"]
+        for stage, data in self.summary().items():
+            if not data["count"]:
+                lines.append(f"{stage:>15} | {0:>6} |")
+                continue
+            lines.append(f"{stage:>15} | {data['count']:>6} | {data['avg_ms']:>8.2f} | {data['p50_ms']:>8.2f} | {data['p90_ms']:>8.2f} | {data['p99_ms']:>8.2f} | {data['max_ms']:>8.2f}")
+        lines.append(f"Actualizaciones reemplazadas antes de dibujarse: {self.superseded}")
+        return "\n".join(lines)
+
+    def chrome_trace_events(self):
+        """Eventos en formato Chrome trace-event: un evento 'X' por etapa de cada traza."""
+        events = []
+        for (pid, tid), name in _TRACE_NAMES.items():
+            if tid is None:
+                events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}})
+            else:
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+
+        with self._lock:
+            traces = list(self._traces)
+        for trace in traces:
+            for stage, start, end in STAGES:
+                pid, tid = _TRACE_THREADS[stage]
+                events.append({
+                    "name": stage,
+                    "cat": "car_status",
+                    "ph": "X",
+                    "ts": trace[start] / 1000,
+                    "dur": max(0, trace[end] - trace[start]) / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"carId": trace["carId"]},
+                })
+        return events
+
+    def export_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": self.chrome_trace_events(), "displayTimeUnit": "ms"}, trace_file)